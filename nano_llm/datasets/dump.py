@@ -2,7 +2,6 @@
 import os
 import json
 import time
-import imageio
 import logging
 
 import numpy as np
@@ -65,6 +64,8 @@ class DumpDataset:
         """
         Save non-interleaved trajectory data to json and video/image files.
         """
+        import imageio
+        
         if not steps or not images:
             return
             
@@ -2,6 +2,8 @@
 import os
 import array
 import logging
+import itertools
+import collections
 import subprocess
 
 import numpy as np
@@ -18,50 +20,109 @@ class RLDSDataset(TFDSDataset):
     """
     Load a TDFS dataset in RLDS format - https://github.com/google-research/rlds
     """
-    def __init__(self, path, split='train', max_episodes=None, max_steps=None, cache_dir='/data/datasets', **kwargs):
+    def __init__(self, path, split='train', max_episodes=None, max_steps=None, cache_dir='/data/datasets', 
+                 deterministic=False, cache=False, batch_size=1, prefetch_to_device=None, decode_in_pipeline=False, **kwargs):
         """
         If path is a URL to an http/https server or Google Cloud Storage Bucket (gs://)
         then the TDFS dataset will first be downloaded and saved to cache_dir.
+        
+        The TFRecord shards are read in parallel, and unless ``deterministic=True`` the episodes
+        are returned in whichever order they finish loading (the steps within each episode stay in order).
+        
+        When iterating over the dataset multiple times, set ``cache=True`` to keep the decoded steps
+        in memory, or ``cache`` to a file path if they won't fit in RAM.  The first pass through the
+        dataset populates the cache, and following passes read from it instead of decoding again.
+        Partial passes (like with ``max_steps``) get discarded instead of cached.  Subclasses that override
+        :meth:`filter_episode` load each episode separately, so ``cache`` is ignored for those.
+        
+        With ``batch_size > 1``, consecutive steps get batched together by tf.data and each item that gets
+        returned while iterating has a leading batch dimension (``is_first`` and ``is_last`` become arrays,
+        and ``instruction`` becomes a list of strings).  Episodes can span batches and batches can span episodes.
+        This isn't supported by subclasses that override :meth:`filter_episode` or :meth:`filter_step`.
+        
+        When all the cameras have the same size, ``step.image_stack`` holds them in one contiguous array and
+        ``step.images`` are per-camera views into it, so they can be converted or copied all at once.
+        
+        For PyTorch consumers, ``prefetch_to_device`` can be set to a CUDA device (like ``'cuda:0'``) and the
+        arrays in each step will be returned as torch tensors that were already copied to the GPU in advance.
+        
+        If ``decode_in_pipeline=True``, the encoded camera images are left encoded by TFDS and get decoded
+        in the step map of the tf.data pipeline instead, in parallel with the other step ops.
         """
+        if batch_size > 1 and (type(self).filter_episode is not RLDSDataset.filter_episode or type(self).filter_step is not RLDSDataset.filter_step):
+            raise ValueError(f"RLDSDataset | batch_size={batch_size} isn't supported by {type(self).__name__}, because it overrides filter_episode() or filter_step()")
+            
         import tensorflow as tf
+        import tensorflow_datasets as tfds
+        
         self.tf = tf
+        self.decode_in_pipeline = decode_in_pipeline
         
         if max_episodes:
             split = f"{split}[:{max_episodes}]"
         
-        super().__init__(path, split=split, cache_dir=cache_dir, **kwargs)
+        options = tf.data.Options()
+        options.deterministic = deterministic
+        options.experimental_optimization.map_fusion = True
+        options.experimental_optimization.map_and_batch_fusion = True
+        options.experimental_optimization.parallel_batch = True
+        options.threading.private_threadpool_size = os.cpu_count()
+        
+        read_config = tfds.ReadConfig(
+            options=options,
+            interleave_cycle_length=16,
+            interleave_block_length=1,
+            num_parallel_calls_for_interleave_files=tf.data.AUTOTUNE,
+        )
+        
+        super().__init__(path, split=split, cache_dir=cache_dir, read_config=read_config, **kwargs)
 
-        step_raw = next(iter(next(iter(self.dataset))['steps']))
-        step_img = next(iter(self))
-        keys_img = list(step_img.images.keys())
+        if not hasattr(self, '_image_obs_keys'):  # get_decoders() is skipped when decoders were provided
+            self.find_cameras(self.features)
+            
+        # flatten the episodes into a stream of steps that get filtered by tf.data worker threads,
+        # and prefetched so that decoding overlaps with whatever is consuming the steps
+        self.max_steps = max_steps
+        self.batch_size = batch_size
+        self.prefetch_to_device = prefetch_to_device
+        
+        self.steps = self.dataset.flat_map(lambda episode: episode['steps'])
+        self.steps = self.steps.map(self._tf_filter_step, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+        self.steps = self.steps.filter(self._tf_valid_step)
+        
+        if cache:
+            if type(self).filter_episode is not RLDSDataset.filter_episode:
+                logging.warning(f"RLDSDataset | cache={cache} is ignored, because {type(self).__name__} overrides filter_episode()")
+            self.steps = self.steps.cache(cache if isinstance(cache, str) else '')
+            
+        if batch_size > 1:
+            self.steps = self.steps.batch(batch_size, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+            
+        self.steps = self.steps.prefetch(tf.data.AUTOTUNE).with_options(options)
+        
+        self._episodes = self.dataset.map(lambda episode: {
+            **episode, 'steps': episode['steps'].map(self._tf_filter_step)
+        })
+        
+        # read the step format from the static dataset spec (without loading an episode)
+        step_spec = self.dataset.element_spec['steps'].element_spec
         
         layout = AttributeDict(
-            cameras = keys_img,
-            image_size = step_img.images[keys_img[0]].shape,
-            step = list(step_raw.keys()),
-            action = step_raw['action'],
+            cameras = self._image_obs_keys,
+            image_size = self._image_size,
+            step = list(step_spec.keys()),
+            action = step_spec['action'].shape.as_list(),
             observation = AttributeDict()
         )
         
-        if isinstance(layout.action, tf.Tensor):
-            layout.action = tf.shape(layout.action).numpy().tolist()
-         
-        for key, value in step_raw['observation'].items():
-            if isinstance(value, tf.Tensor):
-                if value.dtype == tf.string:
-                    value = str
-                else:
-                    value = value.numpy()
-                    value = (value.shape, value.dtype)
-            elif hasattr(value, '__len__'):
-                value = (type(value), len(value))
+        for key, spec in step_spec['observation'].items():
+            if spec.dtype == tf.string:
+                layout.observation[key] = str
             else:
-                value = type(value)
-                
-            layout.observation[key] = value
+                layout.observation[key] = (tuple(spec.shape.as_list()), np.dtype(spec.dtype.as_numpy_dtype))
             
         self.config.update(layout)
-        self.max_steps = max_steps
+        self._filter_step = self._compile_filter_step(batched=(batch_size > 1), has_state=('state' in layout.observation))
         
         logging.success(f"RLDSDataset | loaded {self.config.name} - episode format:\n{pformat(layout, indent=2)}")
         
@@ -85,21 +146,74 @@ class RLDSDataset(TFDSDataset):
         """
         Returns an iterator over all steps (or up to max_steps if it was set) with the episodes running back-to-back.  
         `step.is_first` will be set on new episodes, and `set.is_last` will be set at the end of an episode.
+        If ``batch_size > 1`` was set, then batches of steps are returned instead.
         """
-        steps = 0
-        for episode in iter(self.dataset):
-            episode = self.filter_episode(episode)
-            if not episode:
+        if self.filter_episode.__func__ is RLDSDataset.filter_episode:
+            filter_step = self._filter_step if self.filter_step.__func__ is RLDSDataset.filter_step else self.filter_step
+            steps = (filter_step(step) for step in self.steps.as_numpy_iterator())
+        else:
+            steps = itertools.chain.from_iterable(self.episodes)  # subclass needs per-episode filtering
+        
+        if self.prefetch_to_device:
+            steps = self._prefetch_to_device(steps, self.prefetch_to_device)
+            
+        num_steps = 0
+        
+        for step in steps:
+            if not step:
                 continue
-            for step in episode['steps']:
-                step = self.filter_step(step)
-                if not step:
-                    continue
-                yield(step)
-                steps += 1
-                if self.max_steps and steps >= self.max_steps:
-                    return
+            yield(step)
+            num_steps += len(step.is_first) if getattr(step.is_first, 'ndim', 0) else 1
+            if self.max_steps and num_steps >= self.max_steps:
+                return
+                
+    def _prefetch_to_device(self, steps, device, buffer_size=2):
+        """
+        Copy the arrays in each step to the GPU from pinned memory on a separate CUDA stream,
+        staying ``buffer_size`` steps ahead so that the transfers overlap with the consumer.
+        """
+        import torch
+        
+        device = torch.device(device)
+        stream = torch.cuda.Stream(device)
+        queue = collections.deque()
+        
+        def upload(value):
+            if isinstance(value, np.ndarray) and value.dtype != object:
+                return torch.from_numpy(np.ascontiguousarray(value)).pin_memory().to(device, non_blocking=True)
+            elif isinstance(value, dict):
+                return value.__class__({k: upload(v) for k, v in value.items()})
+            return value
+            
+        def wait(step, event):
+            current_stream = torch.cuda.current_stream(device)
+            current_stream.wait_event(event)
+            for value in itertools.chain(step.values(), step.images.values()):
+                if isinstance(value, torch.Tensor):
+                    value.record_stream(current_stream)  # allocated on the copy stream, used on this one
+            return step
+            
+        for step in steps:
+            if not step:
+                continue
+                
+            with torch.cuda.stream(stream):
+                if 'image_stack' in step:  # copy all the cameras at once, then view them on the GPU
+                    step = upload(AttributeDict({k: v for k, v in step.items() if k != 'images'}))
+                    step.images = self._unstack_images(step.image_stack, batched=step.image_stack.dim() > 4)
+                else:
+                    step = upload(step)
+                event = torch.cuda.Event()
+                event.record(stream)
+                
+            queue.append((step, event))
+            
+            if len(queue) >= buffer_size:
+                yield(wait(*queue.popleft()))
                 
+        while queue:
+            yield(wait(*queue.popleft()))
+            
     @property
     def episodes(self):
         """
@@ -115,8 +229,8 @@ class RLDSDataset(TFDSDataset):
                 if step:
                     yield(step)
                 
-        for episode in iter(self.dataset):
-            episode = self.filter_episode(episode)
+        for episode in iter(self._episodes):
+            episode = self.filter_episode({**episode, 'steps': episode['steps'].as_numpy_iterator()})
             if episode:
                 yield(generator(episode))
           
@@ -135,34 +249,190 @@ class RLDSDataset(TFDSDataset):
         """
         return episode
         
-    def filter_step(self, step):
+    def find_cameras(self, features):
         """
-        Apply filtering and data transformations to each step (override this for custom processing)
+        Find the cameras once up front from the dataset's features (instead of matching the observation keys on every step)
         """
-        data = AttributeDict(
-            action=step.get('action'),
-            images={},
-            instruction=None,
-            is_first=bool(step.get('is_first')),
-            is_last=bool(step.get('is_last')),
-        )
-        
-        observation = step['observation']
+        observation = features['steps']['observation']
         image_keys = ['image', 'wrist_image', 'agentview_rgb']
-
+        
+        self._image_obs_keys = []
+        
         for image_key in image_keys:
-            for observation_key in observation:
-                if image_key in observation_key:
-                    data.images[observation_key] = observation[observation_key].numpy()
+            for observation_key in observation.keys():
+                if image_key in observation_key and observation_key not in self._image_obs_keys:
+                    self._image_obs_keys.append(observation_key)
+                    
+        image_specs = set((tuple(observation[key].shape), observation[key].dtype) for key in self._image_obs_keys)
+        self._stack_images = (len(image_specs) == 1)  # cameras with the same size/dtype get stacked into one array
+        self._image_size = list(observation[self._image_obs_keys[0]].shape) if self._image_obs_keys else None
+        self._encoded_obs_keys = {}
+        
+        return self._image_obs_keys
+        
+    def get_decoders(self, features):
+        """
+        Skip decoding the observations that won't be used by :meth:`filter_step`
+        """
+        import tensorflow_datasets as tfds
+        
+        observation = features['steps']['observation']
+        self.find_cameras(features)
+        
+        keep_keys = self._image_obs_keys + ['state', 'natural_language_instruction']
+        
+        # leave the images encoded so they can be decoded in the step map instead (with the shape they decode to)
+        self._encoded_obs_keys = {
+            key: observation[key].shape for key in self._image_obs_keys 
+            if self.decode_in_pipeline and isinstance(observation[key], tfds.features.Image)
+        }
+        
+        return {'steps': {'observation': {
+            key: tfds.decode.SkipDecoding() for key in observation.keys() if key not in keep_keys or key in self._encoded_obs_keys
+        }}}
+        
+    def _tf_filter_step(self, step):
+        """
+        Select the actions, images, and instructions from each raw step using graph ops (no `.numpy()` calls),
+        so that this runs inside the tf.data pipeline instead of synchronously in Python.
+        """
+        tf = self.tf
+        observation = step['observation']
 
+        if self._encoded_obs_keys:
+            observation = observation.copy()
+            for key, shape in self._encoded_obs_keys.items():
+                observation[key] = tf.io.decode_image(observation[key], channels=shape[-1] or 0, expand_animations=False)
+                observation[key].set_shape(shape)
+                    
+        if self._stack_images:
+            images = tf.stack([observation[key] for key in self._image_obs_keys])
+        else:
+            images = {key: observation[key] for key in self._image_obs_keys}
+            
+        data = dict(
+            action=step['action'],
+            images=images,
+            is_first=step['is_first'],
+            is_last=step['is_last'],
+        )
+        
         instruction = observation.get('natural_language_instruction', step.get('language_instruction'))
         
         if instruction is not None:
-            data.instruction = instruction.numpy().decode('UTF-8')
-         
+            data['instruction'] = instruction
+            
         if 'state' in observation:
-            data.state = observation['state'].numpy()
+            data['state'] = observation['state']
+            
+        return data
+    
+    def _tf_valid_step(self, step):
+        """
+        Graph predicate that drops steps with missing or empty entries before they get converted to numpy
+        (these are the same conditions that :meth:`filter_key` checks for on the Python side)
+        """
+        tf = self.tf
+        
+        for key in ('action', 'images', 'instruction'):
+            if key not in step or not tf.nest.flatten(step[key]):
+                logging.warning(f"RLDSDataset | {self.config.name} steps are missing key: {key}  (skipping)")
+                return tf.constant(False)
+        
+        valid = tf.strings.length(step['instruction']) > 0
+        
+        for value in tf.nest.flatten([step['action'], step['images'], step.get('state', [])]):
+            valid = tf.logical_and(valid, tf.size(value) > 0)
+            
+        return valid
+        
+    def filter_step(self, step):
+        """
+        Apply filtering and data transformations to each step (override this for custom processing).
+        The step has already been selected and validated by the tf.data pipeline and converted to numpy,
+        so this only decodes the instruction, unpacks the images, and runs :meth:`filter_key` on each entry.
+        """
+        images = step.get('images')
+        image_stack = None
+        batched = np.ndim(step.get('is_first')) > 0
+        
+        if isinstance(images, np.ndarray):
+            image_stack = images
+            images = self._unstack_images(image_stack, batched=batched)
+            
+        data = AttributeDict(
+            action=step.get('action'),
+            images=images,
+            instruction=step.get('instruction'),
+            is_first=step.get('is_first') if batched else bool(step.get('is_first')),
+            is_last=step.get('is_last') if batched else bool(step.get('is_last')),
+        )
+        
+        if isinstance(data.instruction, bytes):
+            data.instruction = data.instruction.decode('UTF-8')
+        elif isinstance(data.instruction, np.ndarray):  # decode each unique instruction in the batch once
+            decoded = {instruction: instruction.decode('UTF-8') for instruction in set(data.instruction)}
+            data.instruction = [decoded[instruction] for instruction in data.instruction]
+         
+        if 'state' in step:
+            data.state = step['state']
+            
+        if image_stack is not None:
+            data.image_stack = image_stack
+            
+        return self._validate_step(data)
+    
+    def _compile_filter_step(self, batched=False, has_state=False):
+        """
+        Returns a version of :meth:`filter_step` specialized to this dataset's fixed layout, with the
+        branches on the step format resolved up front.  The steps from the tf.data pipeline have already been
+        validated, so :meth:`filter_key` only gets run if a subclass overrides it.
+        """
+        image_keys = list(enumerate(self._image_obs_keys))
+        stacked = self._stack_images
+        validate = self.filter_key.__func__ is not RLDSDataset.filter_key
+        
+        if stacked and batched:
+            unstack = lambda images: {key: images[:, i] for i, key in image_keys}
+        elif stacked:
+            unstack = lambda images: {key: images[i] for i, key in image_keys}
+        else:
+            unstack = lambda images: images
+            
+        if batched:
+            def decode(instructions):
+                decoded = {instruction: instruction.decode('UTF-8') for instruction in set(instructions)}
+                return [decoded[instruction] for instruction in instructions]
+            flag = lambda x: x
+        else:
+            decode = lambda instruction: instruction.decode('UTF-8')
+            flag = bool
             
+        def filter_step(step):
+            images = step['images']
+            
+            data = AttributeDict(
+                action=step['action'],
+                images=unstack(images),
+                instruction=decode(step['instruction']),
+                is_first=flag(step['is_first']),
+                is_last=flag(step['is_last']),
+            )
+            
+            if has_state:
+                data.state = step['state']
+                
+            if stacked:
+                data.image_stack = images
+                
+            return self._validate_step(data) if validate else data
+            
+        return filter_step
+        
+    def _validate_step(self, data):
+        """
+        Run :meth:`filter_key` on each entry of the step, returning None if any of them were excluded.
+        """
         for key, value in data.items():
             value = self.filter_key(key, value)
             
@@ -174,6 +444,13 @@ class RLDSDataset(TFDSDataset):
                         
         return data
 
+    def _unstack_images(self, image_stack, batched=False):
+        """
+        Return a dict of per-camera views into the contiguous array of stacked cameras,
+        which is shaped ``(cameras, H, W, C)`` or ``(batch_size, cameras, H, W, C)`` when batched.
+        """
+        return {key: image_stack[:, i] if batched else image_stack[i] for i, key in enumerate(self._image_obs_keys)}
+        
     def filter_key(self, key, value):
         """
         Apply filtering to each data entry in the step dict (return None to exclude)
@@ -183,10 +460,6 @@ class RLDSDataset(TFDSDataset):
         elif isinstance(value, (array.array, np.ndarray)):
             if len(value) == 0:
                 return None
-        elif isinstance(value, self.tf.Tensor):
-            if len(value) == 0:
-                return None
-            return value.numpy()
         elif not key.startswith('is_') and not value:
             return None
             
@@ -1,10 +1,8 @@
 #!/usr/bin/env python3
 import os
-import h5py
 import json
 import pprint
 import logging
-import torchvision
 
 import numpy as np
 
@@ -47,6 +45,8 @@ class RobomimicDataset:
         """
         Load the Robomimic dataset from the HDF5 file.
         """
+        import h5py
+        
         self.path = path
         self.file = h5py.File(self.path, 'r', locking=False, libver='latest')
         self.data = self.file['data']
@@ -191,6 +191,8 @@ class RobomimicDataset:
         if self.width == img_width and self.height == img_height:
             return images
 
+        import torchvision
+        
         return torchvision.transforms.functional.resize(
             convert_tensor(images, return_tensors='pt', device='cuda').permute(0,3,1,2),
             (self.height, self.width)  # default is bilinear
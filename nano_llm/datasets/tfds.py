@@ -20,13 +20,23 @@ class TFDSDataset:
       
     TFDS datasets can get quite large (several hundred GB), so check your free disk space first.
     """
-    def __init__(self, path, split='train', cache_dir='/data/datasets', **kwargs):
+    def __init__(self, path, split='train', cache_dir='/data/datasets', read_config=None, decoders=None, use_gpu=False, **kwargs):
         """
         If path is a URL to an http/https server or Google Cloud Storage Bucket (gs://)
         then the TDFS dataset will first be downloaded and saved to cache_dir.
+        
+        The optional ``read_config`` (`tfds.ReadConfig`) controls how the TFRecord shards get read,
+        like the number of files that are interleaved in parallel.  The ``decoders`` dict can customize
+        or skip decoding of the features, otherwise they will be determined by :meth:`get_decoders`.
+        
+        TensorFlow is kept off the GPU unless ``use_gpu=True``, in which case its memory grows on demand.
         """
-        import tensorflow_datasets as tdfs
-        tensorflow_disable_device('GPU') # disable GPU memory pool
+        import tensorflow_datasets as tfds
+        
+        if use_gpu:
+            tensorflow_memory_growth('GPU')
+        else:
+            tensorflow_disable_device('GPU') # disable GPU memory pool
         
         # make sure the cache dir exists
         if cache_dir:
@@ -52,9 +62,22 @@ class TFDSDataset:
             })
 
         # open the dataset (it gets loaded iteratively) 
-        self.dataset = tdfs.builder_from_directory(self.path).as_dataset(split=split) #tdfs.load(dataset_name, split=split, data_dir=cache_dir)
+        builder = tfds.builder_from_directory(self.path)
+        self.features = builder.info.features
+        
+        if decoders is None:
+            decoders = self.get_decoders(self.features)
+            
+        self.dataset = builder.as_dataset(split=split, read_config=read_config, decoders=decoders) #tfds.load(dataset_name, split=split, data_dir=cache_dir)
         logging.success(f"TFDSDataset | loaded {self.config.name} from {path} (records={len(self.dataset)})")
 
+    def get_decoders(self, features):
+        """
+        Override this to return a dict of `tfds.decode` decoders for the dataset's features,
+        for example to skip decoding features that aren't needed (by default, all get decoded)
+        """
+        return None
+        
     @staticmethod
     def download(url, rescan=False, redownload=False, cache_dir='/data/datasets', **kwargs):
         """
@@ -125,3 +148,15 @@ def tensorflow_disable_device(device):
     logical_devices = tf.config.list_logical_devices(device)
     logging.info(f"tensorflow  Physical {device}: {len(devices)}  Logical {device}: {len(logical_devices)}")
 
+
+def tensorflow_memory_growth(device):
+    """
+    Let TensorFlow use the GPU, but only allocate its memory as needed instead of preallocating all of it.
+    
+        https://www.tensorflow.org/guide/gpu#limiting_gpu_memory_growth
+    """
+    import tensorflow as tf
+    devices = tf.config.list_physical_devices(device)
+    
+    for device in devices:
+        tf.config.experimental.set_memory_growth(device, True)
@@ -1,17 +1,26 @@
 #!/usr/bin/env python3
+import sys
+import time
+
 from nano_llm import NanoLLM, ChatHistory, BotFunctions, bot_function
 from datetime import datetime
 
+# names for formatting the date directly (strftime's %- flags aren't portable)
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+MONTHS = ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December')
+
 # For functions that take arguments and return something, use Google format to add Args and Returns.
 @bot_function
 def get_todays_date():
     """ A tool that gets today's date. """
-    return datetime.now().strftime("%A, %B %-m %Y")
+    dt = datetime.now()
+    return f"{WEEKDAYS[dt.weekday()]}, {MONTHS[dt.month-1]} {dt.day} {dt.year}"
    
 @bot_function
 def get_current_time():
     """ A tool that returns the current time. """
-    return datetime.now().strftime("%-I:%M %p")
+    dt = datetime.now()
+    return f"{dt.hour % 12 or 12}:{dt.minute:02d} {'AM' if dt.hour < 12 else 'PM'}"
           
 # load the model   
 model = NanoLLM.from_pretrained(
@@ -21,16 +30,17 @@ model = NanoLLM.from_pretrained(
 )
 
 load = False # Don't load built-in functions
+bot_functions = BotFunctions(load=load)
 
 # create the chat history
 system_prompt ="""
 You are a helpful and friendly AI assistant. 
-""" + BotFunctions.generate_docs(prologue=True, epilogue=True, load=load)
+""" + BotFunctions.generate_docs(prologue=True, epilogue=True, functions=bot_functions)
 
 #print(f"System prompt: {system_prompt}")
 chat_history = ChatHistory(model, system_prompt=system_prompt)
 #print(f"Chat template: {chat_history.template}")
-#print(f"functions: {BotFunctions(load=load)}")
+#print(f"functions: {bot_functions}")
 #print(f"stop token : {chat_history.template.stop}")
 
 
@@ -47,16 +57,27 @@ while True:
     reply = model.generate(
         embedding, 
         streaming=True, 
-        functions=BotFunctions(load=load),
+        functions=bot_functions,
         kv_cache=chat_history.kv_cache,
         stop_tokens=chat_history.template.stop
     )
         
-    # stream the output
+    # stream the output (flushing a few tokens at a time instead of every token)
+    tokens = []
+    last_flush = time.monotonic()
+    
     for token in reply:
-        print(token, end='\n\n' if reply.eos else '', flush=True)
+        tokens.append(token)
+        now = time.monotonic()
+        if reply.eos or len(tokens) >= 4 or now - last_flush > 0.03:
+            sys.stdout.write(''.join(tokens))
+            sys.stdout.flush()
+            tokens.clear()
+            last_flush = now
+            
+    sys.stdout.write(''.join(tokens) + '\n\n')
+    sys.stdout.flush()
 
-    # save the final output
+    # save the final output (the model grew the chat's KV cache in-place, so this keeps the same one)
     #print(chat_history.to_list())
-    chat_history.append(role='bot', text=reply.text, tokens=reply.tokens)
-    chat_history.kv_cache = reply.kv_cache
+    chat_history.append(role='bot', msg=reply)
@@ -6,16 +6,15 @@ import os
 import torch
 import numpy as np
 
-from accelerate import init_empty_weights
-
 from nano_llm import NanoLLM
+from nano_llm.utils import ImageExtensions, is_image, load_image
 
 
 class STModel(NanoLLM):
     """
     Sentence Transformers model. Model names must be "sentence-transformers/{model}" or "cross-encoder/{model}".
     """
-    def __init__(self, model_path, load=True, init_empty_weights=False, **kwargs):
+    def __init__(self, model_path, load=True, init_empty_weights=False, compile=False, quantization=None, **kwargs):
         """
         Load model from path on disk or HuggingFace repo name.
         Model types are bi-encoder (text and multi-modal/clip) and cross-encoder.
@@ -25,6 +24,9 @@ class STModel(NanoLLM):
           model_path (str): Path to model on disk or HuggingFace repo name.
           load (bool): Load model on initialization.
           init_empty_weights (bool): Initialize model with empty weights.
+          compile (bool): Compile the model's modules with ``torch.compile`` (the first calls will be slower while it compiles).
+          quantization (str): Set to ``'int8'`` for weight-only INT8 quantization of the linear layers,
+                              with bitsandbytes on GPU or ``torch.ao`` dynamic quantization on CPU.
 
         **model_kwargs: Additional optional keyword arguments for either SentenceTransformer or CrossEncoder:
         For detailed kwarg descriptions, 
@@ -52,13 +54,32 @@ class STModel(NanoLLM):
             self.st_type = st_type
             del kwargs['st_type']
 
-        torch_dtype = model_kwargs.get('torch_dtype', torch.float16)
+        torch_dtype = model_kwargs.get('torch_dtype', torch.bfloat16 if torch.cuda.is_available() and torch.cuda.is_bf16_supported() else torch.float16)
+
+        if quantization and quantization != 'int8':
+            raise ValueError(f"Sentence Transformers models only support quantization='int8' (was '{quantization}')")
+            
+        quantize_bnb = (quantization == 'int8' and self.device.type == 'cuda')
+        quantize_ao = (quantization == 'int8' and self.device.type == 'cpu')
+        
+        self.quantize_bnb = quantize_bnb
+        
+        if quantize_bnb:
+            from transformers import BitsAndBytesConfig
+            model_kwargs = {
+                'quantization_config': BitsAndBytesConfig(load_in_8bit=True),
+                'device_map': self.device,
+                **model_kwargs
+            }
+        elif quantize_ao:
+            torch_dtype = torch.float32  # dynamic quantization expects float32 linear layers
 
         if not load:
             return
         
         if init_empty_weights:
-            with init_empty_weights():
+            import accelerate
+            with accelerate.init_empty_weights():
                 if self.st_type == 'bi-encoder':
                     from sentence_transformers import SentenceTransformer
                     self.model = SentenceTransformer(model_path, **kwargs, 
@@ -82,7 +103,7 @@ class STModel(NanoLLM):
                                                      model_kwargs=model_kwargs, 
                                                      tokenizer_kwargs=tokenizer_kwargs, 
                                                      config_kwargs=config_kwargs,
-                                                     ).to(torch_dtype).to(self.device).eval()
+                                                     )
                 self.has_embed = True
                 
             else:
@@ -91,12 +112,49 @@ class STModel(NanoLLM):
                                                      model_kwargs=model_kwargs, 
                                                      tokenizer_kwargs=tokenizer_kwargs, 
                                                      config_kwargs=config_kwargs,
-                                                     ).to(torch_dtype).to(self.device).eval()
+                                                     )
                 self.has_embed = False
+                
+            if not quantize_bnb:  # bitsandbytes models are already placed and can't be cast
+                self.model = self.model.to(torch_dtype).to(self.device)
+                
+            if self.st_type == 'bi-encoder':
+                self.model = self.model.to(memory_format=torch.channels_last) # NHWC for faster convolutions in CLIP models
+                
+            self.model = self.model.eval()
+            
+            if quantize_ao:
+                self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
 
         self.config.torch_dtype = next(self.model.parameters()).dtype
 
-    def generate(self, inputs, **generate_kwargs):
+        if compile:
+            self.compile()
+            
+    def compile(self, mode='reduce-overhead', dynamic=True):
+        """
+        Compile the model with ``torch.compile`` for kernel fusion and less per-op dispatch overhead.
+        The submodules are compiled in-place, because ``encode()`` and ``predict()`` don't call the top-level module.
+        """
+        if self.st_type == 'bi-encoder':
+            modules = list(self.model.children())
+        else:
+            modules = [self.model.model]
+            
+        for module in modules:
+            module.compile(mode=mode, dynamic=dynamic)
+            
+        logging.info(f"compiled {self.config.name} with torch.compile (mode={mode}, dynamic={dynamic})")
+        
+    def autocast(self):
+        """
+        Returns a context manager for running inference with autocast in the model's reduced precision.
+        This is only enabled for bitsandbytes models, because the others already have their weights cast
+        to ``torch_dtype`` (bf16 when supported) and autocast would just add per-op dispatch overhead.
+        """
+        return torch.autocast(self.device.type, dtype=torch.float16, enabled=(self.device.type == 'cuda' and self.quantize_bnb))
+
+    def generate(self, inputs, modality='auto', **generate_kwargs):
         """
         Generate embeddings from input text or input images with bi-encoder, or return pairwise similarity scores
         from cross-encoder.
@@ -104,13 +162,18 @@ class STModel(NanoLLM):
                                          and 'https://www.sbert.net/docs/package_reference/cross_encoder/cross_encoder.html#id1'.
         Args:
           inputs (str|ndarray): Text or image inputs to the model/
+          modality (str): For bi-encoders, either 'text' or 'image' to skip detecting the type of the inputs.
+                          With 'auto' (the default), images and strings ending in image file extensions get embedded as images.
 
         Returns:
           Text embeddings, image embeddings, or similarity scores.
         """
         if self.st_type == 'bi-encoder':
+            if modality == 'auto':
+                modality = 'image' if self.is_image_input(inputs) else 'text'
+                
             try:
-                if isinstance(inputs, np.ndarray) or os.path.isfile(inputs): # it's an image array or file path to an image
+                if modality == 'image':
                     return self.embed_image(inputs, **generate_kwargs)
                 else:
                     return self.embed_text(inputs, **generate_kwargs)
@@ -119,22 +182,83 @@ class STModel(NanoLLM):
                 return None
         else:
             try:
-                return self.model.predict(inputs, **generate_kwargs)
+                with torch.inference_mode(), self.autocast():
+                    return self.model.predict(inputs, **generate_kwargs)
             except ValueError as e:
                 logging.error(f"Error generating similarity score with cross-encoder,  make sure input is list of sentence pair tuples: {e}")
                 return None
             
+    @staticmethod
+    def is_image_input(inputs):
+        """
+        Returns true if the inputs (or the first of a list of inputs) are images or paths to image files.
+        Paths are checked by their extension only, so no filesystem access is needed per-request.
+        """
+        if isinstance(inputs, (list, tuple)) and len(inputs) > 0:
+            inputs = inputs[0]
+            
+        if isinstance(inputs, str):
+            return inputs.lower().endswith(ImageExtensions)
+            
+        return isinstance(inputs, np.ndarray) or is_image(inputs)
+        
     def embed_text(self, text, **generate_kwargs):
         """
         Embed text using the model.
         """
-        return self.model.encode(text, **generate_kwargs)
+        with torch.inference_mode(), self.autocast():
+            return self.model.encode(text, **generate_kwargs)
     
     def embed_image(self, image, **generate_kwargs):
         """
         Embed image using the model.
         """
-        return self.model.encode(image, **generate_kwargs)
+        if isinstance(image, str):
+            image = load_image(image)
+        elif isinstance(image, (list, tuple)):
+            image = [load_image(x) if isinstance(x, str) else x for x in image]
+            
+        if isinstance(image, torch.Tensor) and image.dim() == 4:
+            image = image.contiguous(memory_format=torch.channels_last)
+            
+        single_image = not isinstance(image, (list, tuple))
+        
+        if self.device.type != 'cuda' or (not single_image and not image) or generate_kwargs.keys() - {'batch_size', 'normalize_embeddings', 'convert_to_tensor', 'convert_to_numpy'}:
+            with torch.inference_mode(), self.autocast():
+                return self.model.encode(image, **generate_kwargs)
+        
+        # preprocess on the CPU, then copy the pixels to the GPU from pinned memory without blocking
+        # (in chunks of batch_size like encode() does, so long lists don't all need to fit in GPU memory)
+        images = [image] if single_image else image
+        batch_size = generate_kwargs.get('batch_size', 32)
+        embeddings = []
+        
+        for i in range(0, len(images), batch_size):
+            features = self.model.tokenize(images[i:i+batch_size])
+        
+            for key, value in features.items():
+                if isinstance(value, torch.Tensor):
+                    features[key] = value.pin_memory().to(self.device, non_blocking=True)
+                
+            with torch.inference_mode(), self.autocast():
+                batch_embeddings = self.model.forward(features)['sentence_embedding']
+            
+                if generate_kwargs.get('normalize_embeddings'):
+                    batch_embeddings = torch.nn.functional.normalize(batch_embeddings, p=2, dim=1)
+                    
+            embeddings.append(batch_embeddings)
+            
+        embeddings = torch.cat(embeddings) if len(embeddings) > 1 else embeddings[0]
+                
+        if single_image:
+            embeddings = embeddings[0]
+            
+        if generate_kwargs.get('convert_to_tensor'):
+            return embeddings
+        elif generate_kwargs.get('convert_to_numpy', True):
+            return embeddings.float().cpu().numpy()
+        else:
+            return list(embeddings)
     
     def config_vision(self, **kwargs):
         print('Vision config not implemented for Sentence Transformer CLIP models')
@@ -2,18 +2,17 @@
 import os
 import re
 import time
-import json
-import glob
+import collections
+import concurrent.futures
 import shutil
+import weakref
 import logging
+import threading
 
 import torch
 import numpy as np
 
-from transformers import AutoTokenizer
-
-from .vision import CLIPVisionModel, TIMMVisionModel, MMProjector
-from .utils import AttributeDict, convert_tensor, download_model, default_model_api, rename_weights, filter_keys, print_table
+from .utils import AttributeDict, convert_tensor, download_model, default_model_api, rename_weights, filter_keys, print_table, load_json, save_json
 
 
 class NanoLLM():
@@ -26,7 +25,9 @@ class NanoLLM():
       
     The static method :func:`from_pretrained` will load the model using the specified API.
     """
-    ModelCache={}
+    #: Loaded models by their :meth:`from_pretrained` arguments (with ``use_cache=True``).  These are weak
+    #: references, so models get released once nothing else is using them instead of staying in memory.
+    ModelCache=weakref.WeakValueDictionary()
     
     @staticmethod
     def from_pretrained(model, api=None, use_cache=False, **kwargs):
@@ -51,6 +52,12 @@ class NanoLLM():
                               (typically `openai/clip-vit-large-patch14-336 <https://huggingface.co/openai/clip-vit-large-patch14-336>`_).
                               Otherwise, it will use the CLIP variant from the config.
 
+          mm_projector_quant (str): for VLMs, set to ``'int8_wo'`` or ``'fp8_wo'`` for weight-only quantization of the 
+                                    mm_projector with `torchao <https://github.com/pytorch/ao>`_ (by default, it stays in fp16)
+                                    
+          mm_projector_trt (bool): for VLMs, build TensorRT engines of the mm_projector with torch_tensorrt for each input shape
+                                   (by default it runs in PyTorch, and gets captured into CUDA graphs instead)
+                                    
            st_type (str): for Sentence Transformers, the model type: 'bi-encoder' or 'cross-encoder'
 
            model_kwargs, tokenizer_kwargs, config_kwargs: for Sentence Transformers, additional kwargs dictionares for the model, tokenizer,
@@ -61,7 +68,7 @@ class NanoLLM():
           A loaded `NanoLLM` model instance using the determined API.
         """
         if use_cache:
-            model_config = frozenset({'model': model, 'api': api, **kwargs}.items())
+            model_config = model_cache_key(model, api, kwargs)
             cached_model = NanoLLM.ModelCache.get(model_config)
             if cached_model is not None:
                 return cached_model
@@ -168,9 +175,18 @@ class NanoLLM():
           The token ID's with the tensor type as indicated by `return_tensors` (either `'np'` for `np.ndarray`
           or `'pt'` for `torch.Tensor`) and datatype as indicated by `dtype` (by default ``int32``)
         """
-        if return_tensors == 'tvm':
-            return_tensors = 'np'
-  
+        return_tensors = _TENSOR_TYPES.get(return_tensors, return_tensors)
+        
+        if isinstance(text, str) and not kwargs:
+            # single strings go straight through the fast tokenizer's encode(), without a BatchEncoding
+            tokens = self.tokenizer.encode(text, add_special_tokens=add_special_tokens)
+            from_numpy = _FROM_NUMPY.get(return_tensors)
+            
+            if from_numpy is not None and not isinstance(dtype, torch.dtype):
+                return from_numpy(np.asarray(tokens, dtype=dtype)[None, :])
+                
+            return convert_tensor(torch.tensor([tokens]), return_tensors=return_tensors, dtype=dtype)
+            
         tokens = self.tokenizer(
             text, 
             add_special_tokens=add_special_tokens, 
@@ -205,7 +221,7 @@ class NanoLLM():
           use_cache (bool): if True, the text embedding will be cached and returned without additional computation if
                             the same string was already embedded previously.  This is useful for things like the system prompt
                             that are relatively static, but probably shouldn't be used for dynamic user inputs that are unlikely
-                            to be re-used again (leading to unnecessarily increased memory usage).  The default is false.
+                            to be re-used again.  The cache keeps the ``embed_cache_max`` most recently used entries.  The default is false.
           return_tensors (str): ``'np'`` to return a `np.ndarray` or ``'pt'`` to return a `torch.Tensor`
           return_tokens (bool): if True, then the tokens will also be returned in addition to the embedding.
           kwargs:  additional arguments forwarded to :meth:`NanoLLM.tokenize` and the HuggingFace `transformers.AutoTokenizer <https://huggingface.co/docs/transformers/main/en/model_doc/auto#transformers.AutoTokenizer>`_ 
@@ -217,8 +233,13 @@ class NanoLLM():
         """
         result = None
 
-        if use_cache:
-            result = self.embed_cache.get(text)
+        if use_cache and not kwargs:
+            key = (text, add_special_tokens, return_tensors)
+            result = self.embed_cache.get(key)
+            if result is not None:
+                self.embed_cache.move_to_end(key)
+        else:
+            use_cache = False
             
         if result is None:
             tokens = self.tokenize(text, add_special_tokens=add_special_tokens, return_tensors=return_tensors, **kwargs)
@@ -226,7 +247,9 @@ class NanoLLM():
             result = (embed, tokens)
             
             if use_cache:
-                self.embed_cache[text] = result
+                self.embed_cache[key] = result
+                if len(self.embed_cache) > self.embed_cache_max:
+                    self.embed_cache.popitem(last=False)
                 
             #print(f'NanoLLM text:   `{text}`'.replace('\n', '\\n'))
             #print(f'NanoLLM tokens: {convert_tensor(tokens, return_tensors=list)}'.replace('\n', '\\n'))
@@ -260,44 +283,181 @@ class NanoLLM():
         Args:
           image (pil.Image, np.ndarray, torch.Tensor, jetson.utils.cudaImage, __cuda_array_interface__): the image
           return_tensors (str): ``'np'`` to return a `np.ndarray` or ``'pt'`` to return a `torch.Tensor` (on the GPU)
-          return_dict (bool): if true, return a dict including the vision encoder's `hidden_state` and `embedding`
           kwargs: additional arguments forwarded to the vision encoder (`nano_llm.vision.CLIPImageEmbedding`)
         
         Returns:
           The embedding with the tensor type as indicated by `return_tensors` (either `'np'` for `np.ndarray`
-          or `'pt'` for `torch.Tensor`), or a dict containing the embedding and vision encoder's `hidden_state`
-          if ``return_dict=True``.
+          or `'pt'` for `torch.Tensor`)
         """  
         assert(self.has_vision)
 
-        embeddings = []
+        image = self._upload_image(image)
         
-        for i, vision in enumerate(self.vision):
-            embedding = vision(
-                image, #embeddings[i-1] if i > 0 else image,
-                hidden_state = self.config.get('mm_vision_select_layer')
-            ).to(dtype=torch.float16)
+        features = [
+            vision(image, hidden_state=self.vision_select_layer)
+            for vision in self.vision
+        ]
+        
+        embedding = self._project_image_graph(features).to(dtype=torch.float16)  # the LLMs take fp16 embeddings
+
+        logging.debug(f"image embedding  shape={embedding.shape}  dtype={embedding.dtype}  device={embedding.device}")
+        return convert_tensor(embedding, return_tensors=return_tensors)
+      
+    def _upload_image(self, image):
+        """
+        Copy numpy or PIL images to the GPU through a ring of pinned staging buffers on a separate CUDA stream,
+        so that the transfer is asynchronous and can overlap with the GPU still processing the previous frame.
+        Other types of images (like torch tensors or cudaImage) are returned unchanged.
+        """
+        import PIL.Image
+        
+        if self._h2d_stream is None:
+            return image
             
-            if 'clip' in vision.config.name.lower(): # if not 'mm_projector_cfg' in self.config
-                embedding = embedding[:, 1:]
+        if isinstance(image, PIL.Image.Image):
+            image = np.asarray(image)
+        elif not isinstance(image, np.ndarray):
+            return image
             
-            embeddings.append(embedding)
-
-        embedding = torch.cat(embeddings, dim=2)
-        embedding = self.mm_projector(embedding)
+        host = torch.from_numpy(np.ascontiguousarray(image))
+        
+        index = self._image_pinned_index
+        self._image_pinned_index = (index + 1) % len(self._image_pinned)
+        
+        pinned = self._image_pinned[index]
+        event = self._image_pinned_events[index]
+        
+        if pinned is None or pinned.shape != host.shape or pinned.dtype != host.dtype:
+            pinned = self._image_pinned[index] = torch.empty(host.shape, dtype=host.dtype, pin_memory=True)
 
-        logging.debug(f"image embedding  shape={embedding.shape}  dtype={embedding.dtype}  device={embedding.device}")
+        event.synchronize()  # wait for the last transfer out of this buffer before overwriting it
+        pinned.copy_(host)
         
-        if False: #return_dict:
-            output.embedding = embedding
-            for key in output:
-                output[key] = convert_tensor(output[key], return_tensors=return_tensors)
-            return output
-        else:
-            return convert_tensor(embedding, return_tensors=return_tensors)
+        with torch.cuda.stream(self._h2d_stream):
+            image = pinned.to(device='cuda', non_blocking=True)
+            event.record(self._h2d_stream)
+            
+        torch.cuda.current_stream().wait_stream(self._h2d_stream)
+        image.record_stream(torch.cuda.current_stream())
+        
+        return image
+        
+    def _concat_image_features(self, features, out=None):
+        """
+        Write the features from each vision encoder directly into their slice of one contiguous buffer
+        with shape ``(batch, tokens, sum(hidden_sizes))`` in :attr:`vision_dtype`, which gets allocated if ``out`` isn't provided.
+        This replaces separately casting, slicing, and concatenating them (which copies the features twice)
+        """
+        if out is None:
+            shape = self._image_features_shape(features)
+            
+            # a single encoder that already outputs the right dtype and shape needs no copy at all
+            if len(features) == 1 and features[0].shape == shape and features[0].dtype == self.vision_dtype and features[0].is_contiguous():
+                return features[0]
+                
+            out = torch.empty(shape, dtype=self.vision_dtype, device=features[0].device)
+            
+        for vision, (start, end), embedding in zip(self.vision, self._vision_feature_slices, features):
+            if vision._drop_cls:  # the slice is a view that gets read directly by the copy (no intermediate)
+                embedding = embedding[:, 1:]
+                
+            out[..., start:end].copy_(embedding)
+            
+        return out
+        
+    def _image_features_shape(self, features):
+        """
+        Returns the shape of the concatenated features from the vision encoders.
+        """
+        if not self._vision_feature_slices:
+            self._vision_feature_slices = []
+            offset = 0
+            
+            for embedding in features:
+                self._vision_feature_slices.append((offset, offset + embedding.shape[-1]))
+                offset += embedding.shape[-1]
+                
+        batch_size, num_tokens = features[0].shape[:2]
+        
+        if self.vision[0]._drop_cls:
+            num_tokens -= 1
+            
+        return (batch_size, num_tokens, self._vision_feature_slices[-1][1])
+        
+    def _project_image_graph(self, features):
+        """
+        Apply the mm_projector to the vision features by replaying a CUDA graph of it, which gets captured
+        the first time that features with this shape are encountered.  This avoids the launch overhead
+        of the individual kernels on each frame.  It falls back to running normally if the features
+        aren't on the GPU or the graph capture failed, and TensorRT projectors don't get captured.
+        """
+        if self.mm_projector.use_tensorrt or not all(embedding.is_cuda for embedding in features):
+            return self.mm_projector(self._concat_image_features(features))
+            
+        key = self._image_features_shape(features)
+        
+        with torch.inference_mode():
+            graph = self._embed_image_graphs.get(key)
+            
+            if graph is None:
+                graph = self._capture_project_image(key, features[0].device)
+                self._embed_image_graphs[key] = graph
+                
+            if not graph:
+                return self.mm_projector(self._concat_image_features(features))
+                
+            # the static buffers are shared, so only one thread can use the graph at a time
+            with graph.lock:
+                self._concat_image_features(features, out=graph.input)
+                graph.graph.replay()
+            
+                # the output buffer gets overwritten on the next replay (and embeddings can get kept in the chat history)
+                return graph.output.to(dtype=torch.float16, copy=True)
+        
+    def _capture_project_image(self, shape, device):
+        """
+        Capture the mm_projector into a CUDA graph with static input/output buffers.
+        Returns False if the capture failed, in which case the graph shouldn't be used.
+        """
+        input = torch.zeros(shape, dtype=self.vision_dtype, device=device)
+        
+        try:
+            stream = torch.cuda.Stream()  # warmup on a side stream before capturing
+            stream.wait_stream(torch.cuda.current_stream())
+            
+            with torch.cuda.stream(stream):
+                self.mm_projector(input)
+                
+            torch.cuda.current_stream().wait_stream(stream)
+            graph = torch.cuda.CUDAGraph()
+            
+            with torch.cuda.graph(graph):
+                output = self.mm_projector(input)
+        except Exception as error:
+            logging.warning(f"{self.config.name} failed to capture CUDA graph of mm_projector for image features {shape}  ({error})")
+            return False
+            
+        logging.debug(f"{self.config.name} captured CUDA graph of mm_projector for image features {shape}")
+        return AttributeDict(graph=graph, input=input, output=output, lock=threading.Lock())
+        
+    @property
+    def tokenizer(self):
+        """
+        HuggingFace `transformers.AutoTokenizer <https://huggingface.co/docs/transformers/main/en/model_doc/auto#transformers.AutoTokenizer>`_ instance used for tokenization/detokenization.
+        It gets loaded in a background thread while the model loads, and the first access waits for it to finish.
+        """
+        if self._tokenizer_future is not None:
+            self._tokenizer = self._tokenizer_future.result()
+            self._tokenizer_future = None
+            
+        return self._tokenizer
+        
+    @tokenizer.setter
+    def tokenizer(self, tokenizer):
+        self._tokenizer = tokenizer
+        self._tokenizer_future = None
         
     def __init__(self, model_path, **kwargs):
-        #: HuggingFace `transformers.AutoTokenizer <https://huggingface.co/docs/transformers/main/en/model_doc/auto#transformers.AutoTokenizer>`_ instance used for tokenization/detokenization.
         self.tokenizer = None
 
         #: Dict containing the model configuration (inspect it on the HuggingFace model card)
@@ -306,16 +466,12 @@ class NanoLLM():
         #: The local path to the model config file (``config.json``)
         #: Sometimes the config.json is one directory deeper than the model checkpoint, like for
         #: Sentence Transformers CLIP models.
-        for root, _, files in os.walk(model_path):
-            if 'config.json' in files:
-                self.config_path = os.path.join(root, 'config.json')
-                self.model_path = root #: The local path to the model checkpoint/weights in HuggingFace format.
-                break
+        self.config_path = find_model_config(model_path)
+        self.model_path = os.path.dirname(self.config_path) #: The local path to the model checkpoint/weights in HuggingFace format.
 
         # load the config file
         if os.path.isfile(self.config_path):
-            with open(self.config_path) as config_file:
-                self.config = AttributeDict(json.load(config_file))
+            self.config = AttributeDict(load_json(self.config_path))
         else:
             logging.warning(f"could not find model config file at {self.config_path}")
             self.config = AttributeDict()
@@ -326,6 +482,8 @@ class NanoLLM():
         if 'max_position_embeddings' not in self.config and self.config.api != 'st':
             self.config.max_position_embeddings = self.config.get('llm_max_length', 4096)
             
+        self._lower_config_types()
+        
         #: Dict containing the latest generation performance statistics.
         self.stats = AttributeDict()
         
@@ -335,20 +493,27 @@ class NanoLLM():
         #: List of vision encoders for vision/language models.
         self.vision = []  
         
+        #: The datatype that the vision encoders and mm_projector run in (set by :meth:`init_vision`)
+        self.vision_dtype = torch.float16
+        
         #: True if this is a multimodal vision/language model.
         self.has_vision = self.config_vision()
         
+        #: The hidden layer index of the vision encoder(s) that the image features get taken from.
+        self.vision_select_layer = self.config.get('mm_vision_select_layer')
+        
+        # CUDA graphs of the vision projection, keyed by the shapes of the image features
+        self._embed_image_graphs = {}
+        
         #: True if this model has a separate text embedding layer for embed_text()
         self.has_embed = False
         
-        # token and embedding caches
-        self.embed_cache = {}
+        # token and embedding caches (LRU)
+        self.embed_cache = collections.OrderedDict()
+        self.embed_cache_max = 64
         
-        # create the tokenizer        
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, use_fast=True, trust_remote_code=True)
-        except:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, use_fast=False, trust_remote_code=True)
+        # create the tokenizer (in the background, overlapped with the rest of the model loading)
+        self._tokenizer_future = _TOKENIZER_POOL.submit(load_tokenizer, self.model_path)
             
     def is_type(self, architectures):
         # Check the architectures list in the HF config and see if any of these are included.
@@ -356,40 +521,60 @@ class NanoLLM():
         if isinstance(architectures, str):
             architectures = [architectures]
             
-        for model_arch in self.config.get('architectures', []):
-            model_arch = model_arch.lower()
-            for arch in architectures:
-                if arch.lower() in model_arch:
+        architectures = [(arch, arch.lower()) for arch in architectures]
+        
+        for model_arch in self._arch_lower:
+            for arch, arch_lower in architectures:
+                if arch_lower in model_arch:
                     return arch
         
+    def _lower_config_types(self):
+        # Lowercase the model_type and architectures once (these get refreshed when the config is patched)
+        self._model_type_lower = (self.config.get('model_type') or '').lower()
+        self._arch_lower = tuple(arch.lower() for arch in self.config.get('architectures', []))
+        
     def patch_config(self, load=None, save=None, **kwargs):
         # Update the original HF model's config.json with different settings from the provided kwargs.
         # The original will be saved under the same directory to 'config.json.backup'
         backup_path = self.config_path + '.backup'
         
-        if not os.path.isfile(backup_path):
-            logging.info(f"backing up original model config to {backup_path}")
-            shutil.copyfile(self.config_path, backup_path)
-            
-        logging.info(f"patching model config with {kwargs}")
-        
         if save:
             if os.path.isfile(save):
-                with open(save) as config_file:
-                    patched_config = json.load(config_file)
+                patched_config = load_json(save)
             else:
                 patched_config = {}
         else:        
             patched_config = self.config #.copy()
         
-        if load:
-            with open(load, 'r') as config_file:
-                patched_config.update(json.load(config_file))
-                
+        load_config = load_json(load) if load else {}
+        patched_config.update(load_config)
         patched_config.update(kwargs)
 
-        with open(save if save else self.config_path, 'w') as config_file:
-            json.dump(patched_config, config_file, indent=2)
+        if patched_config is self.config:
+            self._lower_config_types()
+            
+        # skip rewriting the file if it wouldn't change
+        save_path = save if save else self.config_path
+
+        if os.path.isfile(save_path):
+            file_config = load_json(save_path)
+            
+            # self.config has the runtime keys added at load, so only check the patched keys against the file
+            if file_config == (patched_config if save else {**file_config, **load_config, **kwargs}):
+                logging.debug(f"model config {save_path} already patched with {kwargs}")
+                return patched_config
+            
+        if not save:
+            self.tokenizer  # finish loading the tokenizer before its config.json gets changed
+            
+        if not os.path.isfile(backup_path):
+            logging.info(f"backing up original model config to {backup_path}")
+            link_or_copy(self.config_path, backup_path)
+            
+        # the new file gets swapped in atomically, which keeps a hardlinked backup intact
+        logging.info(f"patching model config with {kwargs}")
+        save_json(save_path + '.tmp', patched_config, indent=2)
+        os.replace(save_path + '.tmp', save_path)
             
         return patched_config
     
@@ -397,23 +582,37 @@ class NanoLLM():
         # restore the config file back to the original so that HF can load it again
         backup_path = self.config_path + '.backup'
         
-        if os.path.isfile(backup_path): 
-            logging.debug(f"restoring original model config from {backup_path}")
-            shutil.copyfile(backup_path, self.config_path)
+        if not os.path.isfile(backup_path):
+            return
+            
+        if os.path.isfile(self.config_path) and os.path.samefile(backup_path, self.config_path):
+            return  # already the original (it was never patched)
+            
+        self.tokenizer  # finish loading the tokenizer before its config.json gets changed
+        logging.debug(f"restoring original model config from {backup_path}")
+        
+        link_or_copy(backup_path, self.config_path + '.tmp')
+        os.replace(self.config_path + '.tmp', self.config_path)
             
     def config_vision(self, **kwargs):
         # Check the model config for multimodal support (can be in a variety of formats)
-        model_type = self.config.model_type.lower()
+        if not kwargs and getattr(self, '_has_vision', None) is not None:
+            return self._has_vision
+            
+        model_type = self._model_type_lower
         has_vision = 'llava' in model_type
         
         # patch the config to change llava to llama so the quant tools handle it
         if has_vision:
             if 'stablelm' in model_type:
-                self.patch_config(model_type='stablelm_epoch')
+                base_model_type = 'stablelm_epoch'
             elif 'phi' in model_type:
-                self.patch_config(model_type='phi')
+                base_model_type = 'phi'
             else:
-                self.patch_config(model_type='llama')
+                base_model_type = 'llama'
+                
+            if self.config.get('model_type') != base_model_type:
+                self.patch_config(model_type=base_model_type)
         else:
             name_or_path = self.config.get('_name_or_path')
             if name_or_path:
@@ -433,24 +632,24 @@ class NanoLLM():
             if not os.path.isdir(llm_path):
                 os.makedirs(llm_path)
 
-                self.patch_config(
+                patched_llm_config = self.patch_config(
                     load=download_model(os.path.join(self.config.hf_llm_id, 'config.json')),
                     save=llm_config, **self.config.text_config,
                 )
                 
-                with open(llm_config) as file:
-                    self.patch_config(**filter_keys(json.load(file), keep=['max_position_embeddings', 'vocab_size']))
+                self.patch_config(**filter_keys(patched_llm_config, keep=['max_position_embeddings', 'vocab_size']))
                     
-                for tokenizer in glob.glob(os.path.join(self.model_path, 'tokenizer*')):
-                    shutil.copy(tokenizer, llm_path)
+                with os.scandir(self.model_path) as entries:
+                    for entry in entries:
+                        if entry.name.startswith('tokenizer') and entry.is_file():
+                            link_or_copy(entry.path, os.path.join(llm_path, entry.name))
                     
                 rename_weights(self.model_path, llm_path, lambda layer: layer.replace('language_model.', ''))
 
             dataset_config = os.path.join(self.model_path, 'dataset_statistics.json')
             
             if os.path.isfile(dataset_config):
-                with open(dataset_config) as f:
-                    self.config.norm_stats.update(json.load(f))
+                self.config.norm_stats.update(load_json(dataset_config))
                     
             self.model_path = llm_path
              
@@ -482,10 +681,11 @@ class NanoLLM():
             llm_path = os.path.join(self.model_path, os.path.basename(self.config['llm_cfg']['_name_or_path']))
             if not os.path.isdir(llm_path):
                 raise IOError(f"multimodal config was for separate models, but could not find {llm_path}")
-            with open(os.path.join(llm_path, 'config.json')) as config_file:
-                self.config.update(json.load(config_file))
+            self.config.update(load_json(os.path.join(llm_path, 'config.json')))
+            self._lower_config_types()
             self.model_path = llm_path  # redirect downstream LLM APIs to the LLM model
           
+        self._has_vision = has_vision
         return has_vision
                
     def init_vision(self, vision_model=None, vision_api='auto', **kwargs):
@@ -493,8 +693,16 @@ class NanoLLM():
         if not self.has_vision:
             return
 
+        from .vision import CLIPVisionModel, TIMMVisionModel, MMProjector
+        
         use_tensorrt = bool(vision_api == 'auto' or vision_api == 'trt' or vision_api == 'tensorrt')
         
+        # bf16 has the same throughput as fp16 on Ampere and newer, with more range (TensorRT engines stay in fp16)
+        if not use_tensorrt and torch.cuda.get_device_capability()[0] >= 8:
+            self.vision_dtype = torch.bfloat16
+        else:
+            self.vision_dtype = torch.float16
+        
         if self.is_type('openvla'):
             from nano_llm.vision.vla import VLAModel
             
@@ -508,7 +716,7 @@ class NanoLLM():
                     act_layer=self.config.timm_override_act_layers[i],
                     hidden_state=-2,
                     num_classes=0,
-                    dtype=torch.float16,
+                    dtype=self.vision_dtype,
                     use_tensorrt=use_tensorrt, 
                     transform=dict(
                         crop_pct=1.0, # disable
@@ -527,9 +735,11 @@ class NanoLLM():
             logging.debug(f"{self.config.name} vision_hidden_size {vision_hidden_size}  llm_hidden_size {llm_hidden_size}")
             
             self.mm_projector = MMProjector.from_pretrained(
-                self, dtype=torch.float16, 
+                self, dtype=self.vision_dtype, 
                 input_dim=vision_hidden_size, 
-                output_dim=llm_hidden_size
+                output_dim=llm_hidden_size,
+                quantization=kwargs.get('mm_projector_quant'),
+                use_tensorrt=kwargs.get('mm_projector_trt', False),
             )
             
             self.vla = VLAModel(self, action_space=self.config.pop('norm_stats', {}))
@@ -539,9 +749,106 @@ class NanoLLM():
                 CLIPVisionModel.from_pretrained(
                     vision_model if vision_model else self.config.mm_vision_tower,
                     crop=(kwargs.get('vision_scaling', 'resize') == 'crop'),
-                    use_tensorrt=(vision_api == 'auto' or vision_api == 'trt' or vision_api == 'tensorrt'), 
-                    dtype=torch.float16)
+                    use_tensorrt=use_tensorrt, 
+                    dtype=self.vision_dtype)
             ]
             
-            self.mm_projector = MMProjector.from_pretrained(self, dtype=torch.float16)
+            self.mm_projector = MMProjector.from_pretrained(
+                self, dtype=self.vision_dtype, 
+                quantization=kwargs.get('mm_projector_quant'),
+                use_tensorrt=kwargs.get('mm_projector_trt', False),
+            )
+
+        # the range of channels that each vision encoder's features occupy after concatenation
+        # (these get set from the first features, since the hidden states can differ from config.output_shape)
+        self._vision_feature_slices = None
+        
+        # pinned memory ring buffer and stream for uploading images to the GPU (see _upload_image)
+        self._h2d_stream = torch.cuda.Stream() if torch.cuda.is_available() else None
+        self._image_pinned = [None, None]
+        self._image_pinned_events = [torch.cuda.Event() for _ in self._image_pinned] if self._h2d_stream else []
+        self._image_pinned_index = 0
+        
+        # CLIP encoders output the class token first, which gets dropped from the features
+        for vision in self.vision:
+            vision._is_clip = 'clip' in vision.config.name.lower()
+            vision._drop_cls = vision._is_clip # if not 'mm_projector_cfg' in self.config
+            
+
+
+def find_model_config(model_path, config='config.json', max_depth=3):
+    """
+    Search the model directory breadth-first for the config file (up to ``max_depth`` subdirectories deep),
+    and return the path to the shallowest one.  Unlike ``os.walk()``, this stops as soon as it's found, and skips
+    directories that can't contain it (like ``.git``).  If it isn't found, ``{model_path}/config.json`` is returned.
+    """
+    queue = collections.deque([(model_path, 0)])
+    
+    while queue:
+        path, depth = queue.popleft()
+        
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.name == config and entry.is_file():
+                        return entry.path
+                    if depth < max_depth and entry.name not in _SKIP_MODEL_DIRS and entry.is_dir(follow_symlinks=False):
+                        queue.append((entry.path, depth + 1))
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+            
+    return os.path.join(model_path, config)
+    
+    
+def link_or_copy(src, dst):
+    """
+    Hardlink the file from ``src`` to ``dst`` (which only updates filesystem metadata),
+    or copy it if hardlinks aren't supported (like across devices).  ``dst`` gets replaced if it exists.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+        
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+        
+        
+def model_cache_key(model, api, kwargs):
+    """
+    Returns a hashable key for :attr:`NanoLLM.ModelCache` from the arguments to :meth:`NanoLLM.from_pretrained`.
+    Unhashable argument values (like lists or dicts) are represented by their ``repr()`` string.
+    """
+    items = []
+    
+    for key in sorted(kwargs):
+        value = kwargs[key]
+        
+        try:
+            hash(value)
+        except TypeError:
+            value = repr(value)
             
+        items.append((key, value))
+        
+    return (model, api, tuple(items))
+    
+    
+def load_tokenizer(model_path):
+    """
+    Load the HuggingFace tokenizer from the model, preferring the fast (Rust) tokenizer when it's available.
+    """
+    from transformers import AutoTokenizer
+    
+    try:
+        return AutoTokenizer.from_pretrained(model_path, use_fast=True, trust_remote_code=True)
+    except:
+        return AutoTokenizer.from_pretrained(model_path, use_fast=False, trust_remote_code=True)
+        
+        
+# the tensor types for return_tensors that get handled the same way, and how to get them from np.ndarray
+_TENSOR_TYPES = {'tvm': 'np'}
+_FROM_NUMPY = {'np': lambda x: x, 'pt': torch.from_numpy}
+
+_SKIP_MODEL_DIRS = {'.git', '.cache', 'blobs', '__pycache__'}
+_TOKENIZER_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='tokenizer')
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import time
 import queue
+import weakref
 import threading
 import logging
 import traceback
@@ -25,6 +26,7 @@ class Plugin(threading.Thread):
 
     """
     Instances = []  #: Global list of plugin instances
+    FunctionSpecs = weakref.WeakKeyDictionary()  #: Cache of the inspected tool/parameter signatures by function, shared between instances
         
     def __init__(self, name=None, title=None, inputs=1, outputs=1,
                  relay=False, drop_inputs=False, threaded=True, **kwargs):
@@ -470,7 +472,7 @@ class Plugin(threading.Thread):
           func (callable|str): The function or name of the function.
           doc_templates (dict): Substitute the keys with their values in the help docs.
         """
-        if not callable:
+        if not callable(function):
             if isinstance(function, str):
                 name = function
                 function = getattr(self, name, None)
@@ -487,12 +489,32 @@ class Plugin(threading.Thread):
         self.tools[name] = AttributeDict(
             name=name, class_name=self.name,
             function=function, enabled=True,
-            signature=inspect_function(function),
-            openai=inspect_function(function, return_spec='openai'),
+            signature=self.inspect_function(function),
+            openai=self.inspect_function(function, return_spec='openai'),
             docs=f"`{name}()` - {function.__doc__.strip()}",
         )
         
         return self.tools[name]
+    
+    @staticmethod
+    def inspect_function(function, return_spec=None):
+        """
+        Cached version of :func:`nano_llm.utils.inspect_function`, so that the signatures and docs of class methods
+        only get parsed the first time they are registered, instead of for every plugin instance.  The functions are
+        weakly referenced, so the specs of closures and lambdas get released along with them.
+        """
+        try:
+            specs = Plugin.FunctionSpecs.setdefault(getattr(function, '__func__', function), {})
+        except TypeError:  # callables that can't be weakly referenced don't get cached
+            return inspect_function(function, return_spec=return_spec)
+            
+        spec = specs.get(return_spec)
+        
+        if spec is None:
+            spec = inspect_function(function, return_spec=return_spec)
+            specs[return_spec] = spec
+            
+        return spec
         
     def add_parameter(self, attribute: str, name=None, type=None, default=None, read_only=False, 
                       controls=True, help=None, kwarg=None, end=None, **kwargs):
@@ -504,7 +526,7 @@ class Plugin(threading.Thread):
         if not kwarg:
             kwarg = attribute
             
-        init = inspect_function(self.__init__)['parameters'].get(kwarg, {})
+        init = self.inspect_function(self.__init__)['parameters'].get(kwarg, {})
         
         if not read_only: #if not hasattr(self, attribute):
             setattr(self, attribute, default)
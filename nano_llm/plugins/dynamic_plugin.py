@@ -53,7 +53,7 @@ class DynamicPlugin(Plugin):
      
     @classmethod
     def clear_cache(cls):
-        NanoLLM.ModelCache = {}
+        NanoLLM.ModelCache.clear()
         
         for name, plugin in cls.Types.items():
             if hasattr(plugin, 'ModelCache'):
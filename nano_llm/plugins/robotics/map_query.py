@@ -1,13 +1,29 @@
+import os
+import weakref
+import hashlib
 import logging
-from nano_llm import Plugin
-from semantic_map import annotation_manager
-from semantic_map import index_manager
+import collections
+import concurrent.futures
+import functools
+import numpy as np
+from nano_llm import Plugin, NanoLLM
+from nano_llm.utils import AttributeDict, convert_tensor
+from nano_llm.plugins.robotics.path_planning import load_occupancy_grid, plan_path
 from numpy import ndarray
 from typing import Union
 from PIL import Image
 
 SEMANTIC_MAP_ROOT = "/opt/SemanticMap/maps/"
 
+MAP_QUERY_TOOLS = ['get_location_of_something', 'get_your_current_location', 'go_to_location_on_map', 'generate_path_plan']
+
+# the region and polygon indexes get searched in parallel (this pool is shared by all the MapQuery instances)
+_SEARCH_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='MapQuery')
+
+# the loaded indexes by their files, which get released when no MapQuery instances are using them anymore
+_INDEX_CACHE = weakref.WeakValueDictionary()
+
+
 class MapQuery(Plugin):
     """
     Map search tools for the bot.
@@ -18,7 +34,9 @@ class MapQuery(Plugin):
                  map_file_path = f"{SEMANTIC_MAP_ROOT}images/map.png",
                  coco_schema_path = f"{SEMANTIC_MAP_ROOT}annotations/coco_schema.txt",
                  map_schema_path = f"{SEMANTIC_MAP_ROOT}annotations/semantic_map_schema.txt",
-                 index_file_dir = f"{SEMANTIC_MAP_ROOT}annotations", **kwargs):
+                 index_file_dir = f"{SEMANTIC_MAP_ROOT}annotations", 
+                 embed_cache_size = int(os.environ.get('MAP_QUERY_EMBED_CACHE', 1024)),
+                 ann_quantization = 'fp16', tools = None, **kwargs):
 
         """
         Load Map Query for reasoning about annotated maps.
@@ -30,6 +48,11 @@ class MapQuery(Plugin):
             coco_schema_path (str): The path to the COCO schema file.
             map_schema_path (str): The path to the map schema file.
             index_file_dir (str): The directory where the index files are stored.
+            embed_cache_size (int): The number of query text embeddings to keep cached (0 disables the cache).
+                                    The default can be set with the MAP_QUERY_EMBED_CACHE environment variable.
+            ann_quantization (str): How the embeddings get stored in the FAISS search indexes, either 'fp16', 'int8',
+                                    or None for fp32.  Lower precision reduces the memory read during search.
+            tools (list[str]): The names of the methods to register as tools (by default, those in MAP_QUERY_TOOLS)
         """
         super().__init__(outputs=None, threaded=False, **kwargs)
 
@@ -39,13 +62,16 @@ class MapQuery(Plugin):
         self.coco_schema_path = coco_schema_path
         self.map_schema_path = map_schema_path
         self.index_file_dir = index_file_dir
+        
+        self.embed_cache = collections.OrderedDict()  # LRU of query embeddings
+        self.embed_cache_size = embed_cache_size
 
-        self.ann_mgr = annotation_manager.AnnotationManager(self.json_raw_path, self.map_file_path, self.coco_schema_path)
-        self.ann_mgr.write_json(self.json_processed_path)
-        del self.ann_mgr
-        self.ind_mgr = index_manager.IndexManager(self.json_processed_path, self.map_schema_path, index_file_dir=self.index_file_dir)    
-        self.ind_mgr.push_json_blob()
-
+        # the annotations and indexes get loaded the first time they're used (see _index)
+        self.ann_quantization = ann_quantization
+        
+        # the completed path plans get memoized (the occupancy grid is loaded when the first one is planned)
+        self._plan_path = functools.lru_cache(maxsize=256)(self._plan_path_uncached)
+        
         self.add_parameter('json_raw_path', default=json_raw_path) 
         self.add_parameter('json_processed_path', default=json_processed_path)
         self.add_parameter('map_file_path', default=map_file_path)
@@ -53,17 +79,53 @@ class MapQuery(Plugin):
         self.add_parameter('map_schema_path', default=map_schema_path)
         self.add_parameter('index_file_dir', default=index_file_dir)
         
-        self.current_location = self.get_your_current_location()
+        self.current_location = ("Paradise", (100, 101))  # (name, coordinates)
 
         logging.info(f"Map Query plugin initialized with {self.json_raw_path}")
 
         # Add tools
-        self.add_tool(self.get_location_of_something)
-        self.add_tool(self.get_your_current_location)
-        self.add_tool(self.go_to_location_on_map)
-        self.add_tool(self.generate_path_plan)
-        # self.add_tool(self.move_forward)
+        for tool in (MAP_QUERY_TOOLS if tools is None else tools):
+            if not callable(getattr(self, tool, None)):
+                raise ValueError(f"MapQuery | {tool}() is not a method that can be added as a tool")
+            self.add_tool(getattr(self, tool))
 
+    @functools.cached_property
+    def _index(self):
+        """
+        NOT A TOOL
+        The processed annotations, IndexManager, and search indexes of the map, which get built the first time they're
+        needed (and are shared with other MapQuery instances that were created with the same files)
+        """
+        key = (
+            self.json_raw_path, self.json_processed_path, self.map_file_path, 
+            self.coco_schema_path, self.map_schema_path, self.index_file_dir, 
+            self.ann_quantization
+        )
+        
+        index = _INDEX_CACHE.get(key)
+        
+        if index is None:
+            index = _build_index(*key)
+            _INDEX_CACHE[key] = index
+            
+        return index
+        
+    @property
+    def ind_mgr(self):
+        """
+        NOT A TOOL
+        The semantic_map IndexManager with the DocArray indexes and embedding model.
+        """
+        return self._index.ind_mgr
+        
+    @property
+    def ann_indexes(self):
+        """
+        NOT A TOOL
+        The FAISS indexes over the 'region' and 'polygon' text embeddings (None when DocArray gets searched instead)
+        """
+        return self._index.ann_indexes
+        
     def get_your_current_location(self) -> dict:
         """
         Get your current location on the map. Use this tool whenever the user asks where you are located on the map.
@@ -76,9 +138,8 @@ class MapQuery(Plugin):
                 - 'name': The name of the current location on the map.
                 - 'coordinates': The coordinates of the current location on the map.
         """
-        current_name = "Paradise"
-        current_coords = "100 101"
-        return {'name': current_name, 'coordinates': current_coords}
+        current_name, (x, y) = self.current_location
+        return {'name': current_name, 'coordinates': f"{x} {y}"}
     
     def get_location_of_something(self, query: str) -> dict:
         """
@@ -96,14 +157,27 @@ class MapQuery(Plugin):
                 - 'name': The name of the location on the map.
                 - 'coordinates': The coordinates of the location on the map.
         """
-        results_dict = self.text_map_query(query)
+        name, (x, y) = self._get_location(query)
+        return {'name': name, 'coordinates': f"{x}, {y}"}
+        
+    def _get_location(self, query: str) -> tuple:
+        """
+        NOT A TOOL
+        Look up the location on the map for a query, returning its (name, (x, y)) with integer coordinates.
+        """
+        return self._location_from_results(self.text_map_query(query, limit=1, need_polygons=False))
+        
+    def _location_from_results(self, results_dict: dict) -> tuple:
+        """
+        NOT A TOOL
+        Get the (name, (x, y)) of the top region found by text_map_query()
+        """
         root_reg_docs = results_dict['region docs']['root docs']
         name = root_reg_docs[0].name
         polygon_id = root_reg_docs[0].polygon_ids[0]
-        coords = self.ind_mgr.polygon_docs[polygon_id].polygon_centroid
-        coordinates = ', '.join([str(round(coord)) for coord in coords])
+        x, y = self._index.polygon_centroids_int[self._index.polygon_centroid_index[polygon_id]]
         
-        return {'name': name, 'coordinates': coordinates}
+        return name, (int(x), int(y))
     
     def go_to_location_on_map(self, query: str) -> dict:
         """
@@ -116,9 +190,9 @@ class MapQuery(Plugin):
         Returns:
             str: A list of coordinates representing the path plan from the starting location to the ending location.
         """
-        loc_dict = self.get_location_of_something(query)
-        logging.info(f"Going to {loc_dict['name']} at coordinates {loc_dict['coordinates']} on the map")
-        return self.get_path(self.current_location['coordinates'], loc_dict['coordinates'])
+        name, coordinates = self._get_location(query)
+        logging.info(f"Going to {name} at coordinates {coordinates} on the map")
+        return self.get_path(self.current_location[1], coordinates)
 
     def generate_path_plan(self, start: str, end: str) -> str:
         """
@@ -133,10 +207,9 @@ class MapQuery(Plugin):
         Returns:
             str: A list of coordinates representing the path plan from the starting location to the ending location.
         """
-        start_dict = self.get_location_of_something(start)
-        end_dict = self.get_location_of_something(end)
-        path_plan = self.get_path(start_dict['coordinates'], end_dict['coordinates'])
-        logging.info(f"Path plan generated from {start_dict['name']} at {start_dict['coordinates']} to {end_dict['name']} and {end_dict['coordinates']}")
+        (start_name, start_coords), (end_name, end_coords) = [self._location_from_results(x) for x in self.text_map_query_batch([start, end], limit=1, need_polygons=False)]
+        path_plan = self.get_path(start_coords, end_coords)
+        logging.info(f"Path plan generated from {start_name} at {start_coords} to {end_name} and {end_coords}")
         return path_plan
     
     def move_forward(self, distance: int) -> str:
@@ -154,27 +227,58 @@ class MapQuery(Plugin):
 
         return "100 101"
 
-    def get_path(self, start: str, end: str) -> str:
+    def get_path(self, start: tuple, end: tuple) -> str:
         """
         NOT A TOOL
         Get a path plan to navigate from one location to another on the map.
         Args:
-            start: A string representing the starting location on the map.
-            end: A string representing the ending location on the map.
+            start: The (x, y) coordinates of the starting location on the map.
+            end: The (x, y) coordinates of the ending location on the map.
         
         Returns:
             str: A list of coordinates representing the path plan from the starting location to the ending location.
         """
-        path_plan = "100 101 102 103"
         logging.info(f"Getting path from {start} to {end}")
-        return path_plan
+        
+        if self.occupancy_grid is None:
+            return f"{start[0]} {start[1]} {end[0]} {end[1]}"
+            
+        try:
+            path = self._plan_path(tuple(start), tuple(end))
+        except ValueError as error:
+            return f"Couldn't plan a path from {start} to {end} on the map: {error}"
+            
+        if path is None:
+            return f"There is no path from {start} to {end} on the map"
+            
+        return ' '.join(f"{x} {y}" for x, y in path)
+        
+    def _plan_path_uncached(self, start: tuple, end: tuple):
+        """
+        NOT A TOOL
+        Run the A* planner over the occupancy grid, returning the list of (x, y) waypoints (or None if there's no path)
+        """
+        return plan_path(self.occupancy_grid, start, end)
+        
+    @functools.cached_property
+    def occupancy_grid(self):
+        """
+        NOT A TOOL
+        The uint8 traversability grid of the map that paths get planned over, or None if it couldn't be loaded.
+        """
+        try:
+            return load_occupancy_grid(self.map_file_path)
+        except Exception as error:
+            logging.warning(f"MapQuery | couldn't load the occupancy grid from {self.map_file_path}, path planning is disabled  ({error})")
+            return None
 
-    def text_map_query(self, query: str, limit: int = 3) -> dict:
+    def text_map_query(self, query: str, limit: int = 3, need_polygons: bool = True) -> dict:
         """
         NOT A TOOL
         Query the map index for information based on a user's text query.
         Args:
             query: A string representing the user's query.
+            need_polygons: If false, only the region index gets searched (and 'polygon docs' is omitted from the results).
         
         Returns:
             dict: A dictionary containing the root docs, subindex docs, and scores returned by the search.
@@ -182,17 +286,96 @@ class MapQuery(Plugin):
                 - 'region docs': The region documents turned up by the search.
                 - 'polygon docs': The polygon documents turned up by the search.
         """
-        results_dict = {}
-        query_embedding = self.ind_mgr.embedding_model.embed_text(query)
-
-        root_region_docs, sub_region_docs, region_scores = self.ind_mgr.region_doc_index.find_subindex(query_embedding, subindex = 'strings', search_field='embedding', limit=limit)
-        root_polygon_docs, sub_polygon_docs, polygon_scores = self.ind_mgr.polygon_doc_index.find_subindex(query_embedding, subindex = 'strings', search_field='embedding', limit=limit)
-
-        results_dict['region docs'] = {'root docs': root_region_docs, 'subindex docs': sub_region_docs, 'scores': region_scores}
-        results_dict['polygon docs'] = {'root docs': root_polygon_docs, 'subindex docs': sub_polygon_docs, 'scores': polygon_scores}
+        return self.text_map_query_batch([query], limit=limit, need_polygons=need_polygons)[0]
 
-        return results_dict
+    def text_map_query_batch(self, queries: list, limit: int = 3, need_polygons: bool = True) -> list:
+        """
+        NOT A TOOL
+        Query the map index for multiple text queries at once.  The queries get embedded together,
+        and the region and polygon index searches for all of them are run concurrently.
+        Args:
+            queries: A list of strings representing the user's queries.
+            need_polygons: If false, only the region index gets searched (and 'polygon docs' is omitted from the results).
+        
+        Returns:
+            list: A results dict for each query, in the same format as returned by text_map_query()
+        """
+        query_embeddings = self.embed_text(queries)
+        searches = []
+        
+        for query_embedding in query_embeddings:
+            search = {'region docs': _SEARCH_POOL.submit(self._find_subindex, 'region', query_embedding, limit=limit)}
+            
+            if need_polygons:
+                search['polygon docs'] = _SEARCH_POOL.submit(self._find_subindex, 'polygon', query_embedding, limit=limit)
+                
+            searches.append(search)
+            
+        results = []
+        
+        for search in searches:
+            results_dict = {}
+            
+            for key, future in search.items():
+                root_docs, sub_docs, scores = future.result()
+                results_dict[key] = {'root docs': root_docs, 'subindex docs': sub_docs, 'scores': scores}
+                
+            results.append(results_dict)
+            
+        return results
 
+    def _find_subindex(self, index: str, query_embedding, limit: int = 3):
+        """
+        NOT A TOOL
+        Search the text subindex of either the 'region' or 'polygon' docs, returning the same (root docs, subindex docs, scores)
+        as DocArray's find_subindex().  This uses the HNSW index when it's available, and otherwise DocArray's search.
+        """
+        ann = self.ann_indexes.get(index)
+        
+        if ann is None:
+            doc_index = self.ind_mgr.region_doc_index if index == 'region' else self.ind_mgr.polygon_doc_index
+            return doc_index.find_subindex(query_embedding, subindex = 'strings', search_field='embedding', limit=limit)
+            
+        # normalize a copy, because the embedding can be a view of the one cached and searched by the other tasks
+        query = np.ascontiguousarray(convert_tensor(query_embedding, return_tensors='np'), dtype=np.float32).reshape(1, -1)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        
+        scores, ids = ann.index.search(query, limit)
+        ids = [i for i in ids[0] if i >= 0]
+        
+        return [ann.roots[i] for i in ids], [ann.subdocs[i] for i in ids], scores[0][:len(ids)]
+        
+    def embed_text(self, query: Union[str, list]):
+        """
+        NOT A TOOL
+        Embed the query text (or a list of queries), returning the cached embeddings of queries that were asked recently.
+        Queries are matched regardless of case and surrounding whitespace.  The queries that aren't cached get embedded together.
+        """
+        if isinstance(query, str):
+            return self.embed_text([query])[0]
+            
+        keys = [x.strip().lower() for x in query]
+        embeddings = [self.embed_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        if len(missing) == 1:
+            embeddings[missing[0]] = self.ind_mgr.embedding_model.embed_text(query[missing[0]])
+        elif missing:
+            for i, embedding in zip(missing, self.ind_mgr.embedding_model.embed_text([query[i] for i in missing])):
+                embeddings[i] = embedding
+                
+        if not self.embed_cache_size:
+            return embeddings
+            
+        for key, embedding in zip(keys, embeddings):
+            self.embed_cache[key] = embedding
+            self.embed_cache.move_to_end(key)
+            
+        while len(self.embed_cache) > self.embed_cache_size:
+            self.embed_cache.popitem(last=False)
+            
+        return embeddings
+        
     def image_map_query(self, image: Union[str, ndarray], limit: int = 3):
 
         """
@@ -207,20 +390,48 @@ class MapQuery(Plugin):
                 - 'region docs': The region documents turned up by the search.
                 - 'polygon docs': The polygon documents turned up by the search.
         """
-        results_dict = {}
-
-        if isinstance(image, str):
-            image = Image.open(image)
-        elif isinstance(image, ndarray):
-            image = Image.fromarray(image)
+        return self.image_map_query_batch([image], limit=limit)[0]
 
-        image_embedding = self.ind_mgr.embedding_model.embed_image(image)
-
-        # Remember only polygons have images associated with them
-        root_polygon_docs, sub_polygon_docs, polygon_scores = self.ind_mgr.polygon_doc_index.find_subindex(image_embedding, subindex = 'images', search_field='embedding', limit=limit)
-        results_dict['polygon docs'] = {'root docs': root_polygon_docs, 'subindex docs': sub_polygon_docs, 'scores': polygon_scores}
+    def image_map_query_batch(self, images: list, limit: int = 3, max_batch: int = 8) -> list:
+        """
+        NOT A TOOL
+        Query the map index for multiple images at once (like frames that have queued up from a video stream).
+        The images get embedded in batches of up to max_batch, and the polygon index searches are run concurrently.
+        Args:
+            images: A list of image URLs or numpy arrays.
+        
+        Returns:
+            list: A results dict for each image, in the same format as returned by image_map_query()
+        """
+        embedding_model = self.ind_mgr.embedding_model
+        
+        # NanoLLM models load image paths themselves, but arrays still need converted to PIL for the CLIP preprocessing
+        load_paths = not isinstance(embedding_model, NanoLLM)
+        images = [Image.open(image) if load_paths and isinstance(image, str) else Image.fromarray(image) if isinstance(image, ndarray) else image for image in images]
 
-        return results_dict
+        searches = []
+        
+        for i in range(0, len(images), max_batch):
+            batch = images[i:i+max_batch]
+            image_embeddings = embedding_model.embed_image(batch[0] if len(batch) == 1 else batch)
+            
+            if len(batch) == 1:
+                image_embeddings = [image_embeddings]
+                
+            # Remember only polygons have images associated with them
+            for image_embedding in image_embeddings:
+                searches.append(_SEARCH_POOL.submit(
+                    self.ind_mgr.polygon_doc_index.find_subindex, 
+                    image_embedding, subindex = 'images', search_field='embedding', limit=limit
+                ))
+                
+        results = []
+        
+        for search in searches:
+            root_polygon_docs, sub_polygon_docs, polygon_scores = search.result()
+            results.append({'polygon docs': {'root docs': root_polygon_docs, 'subindex docs': sub_polygon_docs, 'scores': polygon_scores}})
+            
+        return results
 
     @classmethod
     def type_hints(cls):
@@ -249,4 +460,158 @@ class MapQuery(Plugin):
                 'display_name': 'DocArray indexes directory',
                 'suggestions': [f"{SEMANTIC_MAP_ROOT}annotations"],
             },
-        }
\ No newline at end of file
+        }
+
+
+def _build_index(json_raw_path, json_processed_path, map_file_path, coco_schema_path, map_schema_path, index_file_dir, ann_quantization):
+    """
+    Process the map annotations, load them into the semantic_map IndexManager, and build the search indexes over them.
+    These get cached in _INDEX_CACHE by the file paths, so MapQuery instances created with the same ones share the same indexes.
+    """
+    from semantic_map import annotation_manager, index_manager
+
+    if _needs_rebuild(json_processed_path, [json_raw_path, map_file_path, coco_schema_path]):
+        ann_mgr = annotation_manager.AnnotationManager(json_raw_path, map_file_path, coco_schema_path)
+        ann_mgr.write_json(json_processed_path)
+        del ann_mgr
+    else:
+        logging.debug(f"MapQuery | {json_processed_path} is up-to-date, skipping the annotation processing")
+
+    ind_mgr = index_manager.IndexManager(json_processed_path, map_schema_path, index_file_dir=index_file_dir)    
+    ind_mgr.push_json_blob()
+
+    # the polygon centroids get looked up by polygon ID for each location query
+    polygon_docs = ind_mgr.polygon_docs
+    polygon_docs = polygon_docs.items() if isinstance(polygon_docs, dict) else enumerate(polygon_docs)
+    polygon_ids, centroids = [], []
+
+    for polygon_id, polygon_doc in polygon_docs:
+        polygon_ids.append(polygon_id)
+        centroids.append(polygon_doc.polygon_centroid)
+
+    polygon_centroids = np.array(centroids, dtype=np.float32).reshape(-1, 2)
+    polygon_centroid_index = {polygon_id: i for i, polygon_id in enumerate(polygon_ids)}
+    polygon_centroids_int = np.round(polygon_centroids).astype(np.int32)
+
+    # approximate nearest-neighbor indexes over the text embeddings (with DocArray as the doc store),
+    # which get saved under index_file_dir and reloaded for as long as the processed map is unchanged
+    ann_hash = _hash_files([json_processed_path, map_schema_path])
+
+    ann_indexes = {
+        key: _build_ann_index(
+            getattr(ind_mgr, f'{key}_docs', None), quantization=ann_quantization,
+            cache_path=os.path.join(index_file_dir, f"{key}_{ann_quantization or 'fp32'}_{ann_hash}.faiss") if ann_hash else None
+        )
+        for key in ('region', 'polygon')
+    }
+
+    logging.info(f"MapQuery | loaded the map annotations and indexes from {json_processed_path}")
+    
+    return AttributeDict(
+        ind_mgr=ind_mgr,
+        ann_indexes=ann_indexes,
+        polygon_centroids=polygon_centroids,
+        polygon_centroids_int=polygon_centroids_int,
+        polygon_centroid_index=polygon_centroid_index,
+    )
+    
+    
+def _build_ann_index(docs, subindex: str = 'strings', quantization: str = None, M: int = 16, ef_search: int = 64, cache_path: str = None):
+    """
+    Build a FAISS HNSW index over the embeddings in the subindex of each root doc, searched by the inner product
+    of the normalized embeddings (cosine similarity).  With quantization set to 'fp16' or 'int8', the vectors get
+    stored with FAISS's scalar quantizer (int8 has a range per dimension).  Returns None if FAISS isn't installed or the docs couldn't be indexed,
+    in which case the DocArray indexes get searched instead.  If cache_path is set, the index gets saved there
+    after it's built, and memory-mapped from it instead of being rebuilt when it already exists.
+    """
+    if not docs:
+        return None
+
+    try:
+        import faiss
+
+        roots, subdocs = [], []
+
+        for root in (docs.values() if isinstance(docs, dict) else docs):
+            for subdoc in getattr(root, subindex):
+                roots.append(root)
+                subdocs.append(subdoc)
+
+        if cache_path and os.path.isfile(cache_path):
+            index = _read_faiss_index(cache_path)
+
+            if index.ntotal == len(subdocs):
+                index.hnsw.efSearch = ef_search
+                logging.info(f"MapQuery | loaded FAISS HNSW index over {len(subdocs)} {subindex} of {len(docs)} docs from {cache_path}")
+                return AttributeDict(index=index, roots=roots, subdocs=subdocs)
+
+            logging.warning(f"MapQuery | {cache_path} has {index.ntotal} embeddings instead of {len(subdocs)}, rebuilding it")
+
+        embeddings = [convert_tensor(subdoc.embedding, return_tensors='np').reshape(-1) for subdoc in subdocs]
+        embeddings = np.ascontiguousarray(np.stack(embeddings), dtype=np.float32)
+        faiss.normalize_L2(embeddings)
+
+        if quantization:
+            quantizers = {'fp16': faiss.ScalarQuantizer.QT_fp16, 'int8': faiss.ScalarQuantizer.QT_8bit}
+
+            if quantization not in quantizers:
+                raise ValueError(f"ann_quantization should be 'fp16', 'int8', or None (was '{quantization}')")
+
+            index = faiss.IndexHNSWSQ(embeddings.shape[1], quantizers[quantization], M, faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)
+        else:
+            index = faiss.IndexHNSWFlat(embeddings.shape[1], M, faiss.METRIC_INNER_PRODUCT)
+
+        index.hnsw.efSearch = ef_search
+        index.add(embeddings)
+    except Exception as error:
+        logging.warning(f"MapQuery | couldn't build FAISS index over the {subindex} of {len(docs)} docs, using DocArray search instead  ({error})")
+        return None
+
+    if cache_path:
+        try:
+            faiss.write_index(index, cache_path)
+        except Exception as error:
+            logging.warning(f"MapQuery | couldn't save FAISS index to {cache_path}, it will be rebuilt next time  ({error})")
+
+    logging.info(f"MapQuery | built FAISS HNSW index over {len(subdocs)} {subindex} of {len(docs)} docs  (quantization={quantization})")
+    return AttributeDict(index=index, roots=roots, subdocs=subdocs)
+
+
+def _needs_rebuild(output_path, input_paths):
+    """
+    Returns true if the output file is missing or older than any of the input files it was generated from.
+    """
+    try:
+        output_mtime = os.stat(output_path).st_mtime
+        return any(os.stat(path).st_mtime > output_mtime for path in input_paths)
+    except OSError:
+        return True
+
+
+def _hash_files(paths):
+    """
+    Returns a hex digest over the contents of the files, or None if any of them couldn't be read.
+    """
+    digest = hashlib.sha1()
+    
+    try:
+        for path in paths:
+            with open(path, 'rb') as file:
+                digest.update(file.read())
+    except OSError:
+        return None
+        
+    return digest.hexdigest()[:16]
+    
+    
+def _read_faiss_index(path):
+    """
+    Load a FAISS index from disk, memory-mapping it if that's supported for the type of index.
+    """
+    import faiss
+    
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(path)
@@ -1,8 +1,8 @@
 import logging
-import json
 from nano_llm import Plugin
 from nano_llm.plugins.robotics.ros_connector import NodeType, ROSLog, LogLevel
 
+
 class MotionQuery(Plugin):
     def __init__(self, **kwargs):
         
@@ -11,6 +11,21 @@ class MotionQuery(Plugin):
 
         self.add_parameter('robot_namespace', type=str, default="")
 
+        # the Twist publisher message that move_finite() copies, replacing only the velocity/duration
+        # (the dicts get sent to ROS2Connector directly, so the ones that were already output aren't modified)
+        self._twist_template = {
+            "linear": {"x": 0.0, "y": 0.0, "z": 0.0},
+            "angular": {"x": 0.0, "y": 0.0, "z": 0.0}
+        }
+        self._json_template = {
+            "node_type": NodeType('publisher'),
+            "msg_type": 'geometry_msgs/msg/Twist',
+            "name": None,
+            "timer_period": 0.05,
+            "timer_duration": 0.0,
+            "msg": self._twist_template,
+        }
+
         self.add_tool(self.move_finite)
         self.add_tool(self.topic_subscriber)
 
@@ -29,30 +44,12 @@ class MotionQuery(Plugin):
         Returns:
             A json dict (format and contents unknown at this time)
         """
-        robot_namespace = self.robot_namespace
-        twist_msg = {
-            "linear": {
-                "x": direction * speed,
-                "y": 0.0,
-                "z": 0.0
-            },
-            "angular": {
-                "x": 0.0,
-                "y": 0.0,
-                "z": 0.0
-            }
-        }
-        json_dict = {
-            "node_type": NodeType('publisher'),
-            "msg_type": 'geometry_msgs/msg/Twist',
-            "name": f"{robot_namespace}/cmd_vel",
-            "timer_period": 0.05,
+        self.output({
+            **self._json_template,
+            "name": f"{self.robot_namespace}/cmd_vel",
             "timer_duration": abs(distance / speed),
-            "msg": twist_msg,
-            # "ros_log": ROSLog(name="cmd_vel_log", level=LogLevel('INFO'), msg="created publisher for cmd_vel")
-        }
-
-        self.output(json.dumps(json_dict))
+            "msg": {**self._twist_template, "linear": {**self._twist_template["linear"], "x": direction * speed}},
+        })
 
         return "Moved a finite distance"
 
@@ -81,7 +78,7 @@ class MotionQuery(Plugin):
             "msg": {}
         }
         
-        self.output(json.dumps(json_dict))
+        self.output(json_dict)
 
         return "test"
 
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+import logging
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    logging.debug("numba isn't installed, the path planner will run as regular Python (much slower)")
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+def load_occupancy_grid(path, free_threshold=206):
+    """
+    Load a map image (like the .pgm from a ROS map_server) and return a uint8 grid that's 1 where the map is
+    traversable, and 0 for obstacles and unknown space.  By default, pixels brighter than the unknown value (205)
+    are considered free, which matches the map_server's ``free_thresh=0.196``.
+    Binary 8-bit .pgm files get memory-mapped instead of decoded with PIL.
+    """
+    pixels = load_pgm_mmap(path) if path.lower().endswith('.pgm') else None
+
+    if pixels is None:
+        from PIL import Image
+
+        with Image.open(path) as image:
+            pixels = np.asarray(image.convert('L'))
+
+    return (pixels >= free_threshold).astype(np.uint8)
+
+
+def load_pgm_mmap(path):
+    """
+    Memory-map the pixels of a binary (P5) 8-bit .pgm image as a read-only HxW uint8 array by parsing its header.
+    Returns None if it's another type of PGM (like plain/ASCII or 16-bit), which PIL can load instead.
+    """
+    fields = []
+
+    with open(path, 'rb') as file:
+        while len(fields) < 4:
+            line = file.readline()
+
+            if not line:
+                return None
+
+            fields.extend(line.split(b'#', 1)[0].split())
+
+        offset = file.tell()
+
+    if len(fields) != 4 or fields[0] != b'P5' or int(fields[3]) > 255:
+        return None
+
+    width, height = int(fields[1]), int(fields[2])
+    return np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(height, width))
+
+
+def plan_path(grid, start, end):
+    """
+    Find the shortest 8-connected path with A* between the (x, y) start and end cells of the occupancy grid.
+    Returns a list of (x, y) waypoints where the path changes direction (including the start and end),
+    or None if there's no path between them.
+    """
+    height, width = grid.shape
+
+    for x, y in (start, end):
+        if x < 0 or y < 0 or x >= width or y >= height:
+            raise ValueError(f"coordinates ({x}, {y}) are outside of the {width}x{height} map")
+
+    path = _astar(grid, int(start[0]), int(start[1]), int(end[0]), int(end[1]))
+
+    if len(path) == 0:
+        return None
+
+    # drop the cells in the middle of straight segments
+    if len(path) > 2:
+        steps = np.diff(path, axis=0)
+        turns = np.any(steps[1:] != steps[:-1], axis=1)
+        path = np.concatenate([path[:1], path[1:-1][turns], path[-1:]])
+
+    return [(int(x), int(y)) for x, y in path]
+
+
+@njit(cache=True)
+def _astar(grid, start_x, start_y, end_x, end_y):
+    """
+    A* over a uint8 traversability grid with the octile distance heuristic.  The open set is a binary min-heap
+    of (f_score, cell) kept in parallel arrays, since heapq can't be compiled.  Returns an Nx2 int32 array of the
+    (x, y) cells along the path, which is empty if the end can't be reached.
+    """
+    height, width = grid.shape
+    num_cells = height * width
+
+    start = start_y * width + start_x
+    end = end_y * width + end_x
+
+    g_score = np.full(num_cells, np.inf, dtype=np.float32)
+    parents = np.full(num_cells, -1, dtype=np.int32)
+    closed = np.zeros(num_cells, dtype=np.uint8)
+
+    heap_f = np.empty(1024, dtype=np.float32)
+    heap_cell = np.empty(1024, dtype=np.int32)
+    heap_size = 0
+
+    offsets_x = np.array([1, -1, 0, 0, 1, 1, -1, -1], dtype=np.int32)
+    offsets_y = np.array([0, 0, 1, -1, 1, -1, 1, -1], dtype=np.int32)
+    diagonal = np.float32(np.sqrt(2.0))
+
+    g_score[start] = 0.0
+    heap_f[0] = 0.0
+    heap_cell[0] = start
+    heap_size = 1
+
+    while heap_size > 0:
+        # pop the cell with the lowest f_score
+        cell = heap_cell[0]
+        heap_size -= 1
+
+        if heap_size > 0:
+            f = heap_f[heap_size]
+            c = heap_cell[heap_size]
+            i = 0
+
+            while True:
+                child = 2 * i + 1
+                if child >= heap_size:
+                    break
+                if child + 1 < heap_size and heap_f[child + 1] < heap_f[child]:
+                    child += 1
+                if heap_f[child] >= f:
+                    break
+                heap_f[i] = heap_f[child]
+                heap_cell[i] = heap_cell[child]
+                i = child
+
+            heap_f[i] = f
+            heap_cell[i] = c
+
+        if closed[cell]:
+            continue
+
+        closed[cell] = 1
+
+        if cell == end:
+            break
+
+        x = cell % width
+        y = cell // width
+
+        for n in range(8):
+            nx = x + offsets_x[n]
+            ny = y + offsets_y[n]
+
+            if nx < 0 or ny < 0 or nx >= width or ny >= height:
+                continue
+
+            neighbor = ny * width + nx
+
+            if closed[neighbor] or (grid[ny, nx] == 0 and neighbor != end):
+                continue
+
+            if n >= 4:  # don't cut the corners of obstacles
+                if grid[y, nx] == 0 or grid[ny, x] == 0:
+                    continue
+                cost = g_score[cell] + diagonal
+            else:
+                cost = g_score[cell] + 1.0
+
+            if cost >= g_score[neighbor]:
+                continue
+
+            g_score[neighbor] = cost
+            parents[neighbor] = cell
+
+            dx = abs(end_x - nx)
+            dy = abs(end_y - ny)
+            f = cost + max(dx, dy) + (diagonal - 1.0) * min(dx, dy)
+
+            # push the neighbor onto the heap, growing it if needed
+            if heap_size >= len(heap_f):
+                heap_f = np.concatenate((heap_f, np.empty(len(heap_f), dtype=np.float32)))
+                heap_cell = np.concatenate((heap_cell, np.empty(len(heap_cell), dtype=np.int32)))
+
+            i = heap_size
+            heap_size += 1
+
+            while i > 0:
+                parent = (i - 1) // 2
+                if heap_f[parent] <= f:
+                    break
+                heap_f[i] = heap_f[parent]
+                heap_cell[i] = heap_cell[parent]
+                i = parent
+
+            heap_f[i] = f
+            heap_cell[i] = neighbor
+
+    if not closed[end]:
+        return np.empty((0, 2), dtype=np.int32)
+
+    length = 1
+    cell = end
+
+    while cell != start:
+        cell = parents[cell]
+        length += 1
+
+    path = np.empty((length, 2), dtype=np.int32)
+    cell = end
+
+    for i in range(length - 1, -1, -1):
+        path[i, 0] = cell % width
+        path[i, 1] = cell // width
+        cell = parents[cell]
+
+    return path
@@ -1,27 +1,37 @@
 #!/usr/bin/env python3
+import re
+import array
+import keyword
 import logging
+import functools
+import collections
 from functools import partial
 from nano_llm import Plugin
+import numpy as np
 import rclpy
 from rclpy.node import Node
 from rclpy.action import ActionClient
 from action_msgs.msg import GoalStatus
 import rclpy.logging
 from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
-from rclpy.executors import MultiThreadedExecutor
+from rclpy.executors import SingleThreadedExecutor
 from rclpy.impl.rcutils_logger import RcutilsLogger
+from rclpy.serialization import serialize_message
+from rclpy.qos import QoSProfile, HistoryPolicy, ReliabilityPolicy, DurabilityPolicy
 from rosidl_runtime_py import set_message, convert
 import importlib
 from queue import Queue
 from enum import Enum
-from typing import Optional, Annotated, Any
-from pydantic import BaseModel, Field, ValidationError
+from typing import Optional, Annotated, Any, Union
+from msgspec import Struct, Meta
+import msgspec
 import threading
+import traceback
 import time
 
-########################################################
-##### Pydantic schemas for ROS2 message validation #####
-########################################################
+#######################################################
+##### msgspec schemas for ROS2 message validation #####
+#######################################################
 
 class LogLevel(str, Enum):
     """
@@ -42,26 +52,35 @@ class NodeType(str, Enum):
     SERVICE_CLIENT = "service_client"
     ACTION_CLIENT = "action_client"
 
-class ROSLog(BaseModel):
+class ROSLog(Struct, kw_only=True, forbid_unknown_fields=True):
     """
-
-    Pydantic schema for ROS2 log messages
+    msgspec schema for ROS2 log messages
     """
-    name: Optional[str] = Field(description = "the name of the logger")
-    level: Optional[LogLevel] = Field(description = "the log level, e.g. 'LogLevel.INFO'", default = LogLevel.INFO) 
-    msg: str = Field(description = "the log message emitted when the logger is created")
+    name: Annotated[Optional[str], Meta(description = "the name of the logger")] = None
+    level: Annotated[Optional[LogLevel], Meta(description = "the log level, e.g. 'LogLevel.INFO'")] = LogLevel.INFO
+    msg: Annotated[str, Meta(description = "the log message emitted when the logger is created")]
 
-class ROSMessage(BaseModel):
+class ROSMessage(Struct, kw_only=True, gc=False, forbid_unknown_fields=True):
     """
-    Pydantic schema for ROS2 topic, service client request, and action client goal messages
+    msgspec schema for ROS2 topic, service client request, and action client goal messages.
+    These get decoded and validated in one pass from JSON, and aren't tracked by the garbage collector.
+    Like all Structs they use __slots__, and unknown fields get rejected instead of silently ignored.
     """
-    node_type: NodeType = Field(description = "the type of ROS2 node either 'publisher', 'subscriber', 'service_client', or 'action_client'")
-    msg_type: str = Field(description = "the type of ROS2 message, service, or action, e.g. 'std_msgs/msg/String'")
-    name: str = Field(description = "the name of the ROS2 topic, service, or client, e.g. 'chatter'")
-    timer_period: Annotated[float, Field(description = "the period of the timer, ignored if type is not 'publisher'", default=0, ge=0.0)]
-    timer_duration: Annotated[float, Field(description = "the duration of time that a message will be published, ignored if type is not 'publisher'", default=0, ge=0.0)]
-    msg: dict = Field(description = "the message payload for the topic, service request/response, or action goal/result")
-    ros_log: Optional[ROSLog] = Field(description = "optional ros logging message to be emitted when logger is created", default='')
+    node_type: Annotated[NodeType, Meta(description = "the type of ROS2 node either 'publisher', 'subscriber', 'service_client', or 'action_client'")]
+    msg_type: Annotated[str, Meta(description = "the type of ROS2 message, service, or action, e.g. 'std_msgs/msg/String'")]
+    name: Annotated[str, Meta(description = "the name of the ROS2 topic, service, or client, e.g. 'chatter'", min_length=1)]
+    timer_period: Annotated[float, Meta(description = "the period of the timer, ignored if type is not 'publisher'", ge=0.0)] = 0.0
+    timer_duration: Annotated[float, Meta(description = "the duration of time that a message will be published, ignored if type is not 'publisher'", ge=0.0)] = 0.0
+    msg: Annotated[Union[dict[str, Any], str], Meta(description = "the message payload for the topic, service request/response, or action goal/result (or 'destroy'/'cancel')")]
+    ros_log: Annotated[Optional[ROSLog], Meta(description = "optional ros logging message to be emitted when logger is created")] = None
+
+
+_ROS_MESSAGE_DECODER = msgspec.json.Decoder(ROSMessage)
+_JSON_ENCODER = msgspec.json.Encoder()
+
+# QoS for the publishers and subscribers (the keep-last/reliable/volatile profile that
+# rclcpp's intra-process transport requires, so components in the same process can use it)
+_ROS_QOS = QoSProfile(depth=10, history=HistoryPolicy.KEEP_LAST, reliability=ReliabilityPolicy.RELIABLE, durability=DurabilityPolicy.VOLATILE)
 
 
 ########################################################
@@ -93,6 +112,8 @@ class ROS2Connector(Plugin, Node):
 
         Args:
             init_args (list): list of arguments to pass to the ROS2 node
+            output_queue_size (int): the max number of received messages waiting to be output,
+                                     after which the oldest ones get dropped (default 64)
 
         """
         Plugin.__init__(self, inputs=['json_in'], outputs=['json_out'],**kwargs)
@@ -101,16 +122,17 @@ class ROS2Connector(Plugin, Node):
         rclpy.init(args=kwargs.get('init_args', []))
         # Initialize node
         self.node = rclpy.create_node('ros2_connector')
-        # Create the MultiThreadedExecutor
-        self.exec = MultiThreadedExecutor()
-        # Add the node to the executor
+        # Create the executor - the callbacks are all in mutually-exclusive groups and don't block,
+        # so a single thread avoids the extra wait-set locking and thread handoffs of the MultiThreadedExecutor
+        self.exec = SingleThreadedExecutor()
+        # Add the node to the executor (which gets spun from the plugin's run() thread)
         self.exec.add_node(self.node)
-        self._executor_thread = None
+        # Triggered when inputs get queued, so they wake up the executor's wait in run()
+        self.input_guard = self.node.create_guard_condition(lambda: None)
     
-        # ^ Where are we spinning this node? It appears that it will still be a blocking node unless we
-        # explicitly run the executor in a different thread in parallel with main script. 
-        # Understand that all of the functions defined below are considered callbacks, and adding this node
-        # to a multi-threaded executor allows these callbacks to execute in parallel (in separate threads)
+        # Understand that all of the functions defined below are considered callbacks, which the executor
+        # runs one at a time on the same thread as process(), so none of them block (service responses are
+        # handled from done callbacks, and requests for servers that aren't up yet are retried from timers)
 
 
         self.node.get_logger().info("ROS2Connector plugin started")
@@ -123,9 +145,13 @@ class ROS2Connector(Plugin, Node):
         self.action_clients = {}
         # Initialize logger, timer, callback group, and goal handle dictionaries
         self.loggers = {}
+        self.log_functions = {}  # the bound logging methods of each logger, by LogLevel
+        self.info_enabled = {}   # if INFO messages are enabled for each logger, so the fast paths can skip formatting them
         self.timers_dict = {}
         self.callback_groups = {}
         self.goal_handles = {}
+        self.server_timers = {}     # the timers checking for the servers that requests are waiting on
+        self.pending_requests = {}  # the requests waiting on each server, by the client name
 
         self.log_levels = {
             "DEBUG": rclpy.logging.LoggingSeverity.DEBUG,
@@ -135,15 +161,26 @@ class ROS2Connector(Plugin, Node):
             "FATAL": rclpy.logging.LoggingSeverity.FATAL
         }
 
-    def get_ros_msg_from_json(self, json_msg: dict) -> ROSMessage:
+        # Messages received by the subscribers get converted and output from another thread, so the
+        # executor returns from their callbacks right away (the oldest get dropped if it falls behind)
+        self.output_queue = collections.deque(maxlen=kwargs.get('output_queue_size', 64))
+        self.output_event = threading.Event()
+        self.output_thread = threading.Thread(target=self.process_outputs, daemon=True)
+        self.output_thread.start()
+
+    def get_ros_msg_from_json(self, json_msg: Union[dict, str, bytes]) -> ROSMessage:
         """
-        Validate JSON input and cast to ROSMessage.
+        Validate JSON input and cast to ROSMessage.  Dicts sent from other plugins get converted
+        directly, without serializing them to a JSON string and parsing it again.
         """
         try:
-            ros_msg = ROSMessage.model_validate_json(json_msg)
-        except ValidationError as e:
+            if isinstance(json_msg, dict):
+                ros_msg = msgspec.convert(json_msg, ROSMessage)
+            else:
+                ros_msg = _ROS_MESSAGE_DECODER.decode(json_msg)
+        except msgspec.DecodeError as e:
             print(f"Invalid ROS2 message: {e}")
-            self.get_logger().error(f"Invalid ROS2 message sent by agent: {e}")
+            self.node.get_logger().error(f"Invalid ROS2 message sent by agent: {e}")
             return False
 
         print(ros_msg)
@@ -153,50 +190,63 @@ class ROS2Connector(Plugin, Node):
         """
         Get the ROS2 message type from the JSON message and import the class.
         """
-        msg_type_str = ros_msg.msg_type
+        msg_type, msg_class = self.import_message_type(ros_msg.msg_type)
+        return msg_type, msg_class, ros_msg.node_type
+
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def import_message_type(msg_type_str: str) -> tuple:
+        """
+        Import the ROS2 message, service, or action class from its type string (e.g. 'std_msgs/msg/String'),
+        and return the (type name, class).  These are cached so they only get imported the first time.
+        """
         package, msg_dir, msg_type = msg_type_str.split('/')
-        # get the message class and import module and class
         msg_module = importlib.import_module(f'{package}.{msg_dir}')
-        msg_class = getattr(msg_module, msg_type)
-        globals()[msg_type] = msg_class
-        node_type = ros_msg.node_type
-        return msg_type, msg_class, node_type
+        return msg_type, getattr(msg_module, msg_type)
 
            
-    def create_publisher(self, msg: ROSMessage, msg_class) -> bool:
+    def create_publisher(self, msg: ROSMessage, msg_class, pub_msg: Any = None) -> bool:
         """
-        Create a ROS2 publisher.
+        Create a ROS2 publisher (pub_msg is the already-converted ROS2 message for its timer, if any).
         """
         assert(msg.node_type == NodeType.PUBLISHER)
         # self.create_logger(msg)
         self.callback_groups[msg.name] = MutuallyExclusiveCallbackGroup()
-        _, msg_class, _ = self.get_ros_message_type(msg)
-        pub_msg = self.json_to_ros_msg(msg, msg_class)
+        if pub_msg is None:
+            pub_msg = self.json_to_ros_msg(msg, msg_class)
         try:
             if not self.pubs.get(msg.name):
                 self.pubs[msg.name] = self.node.create_publisher(msg_class, 
                                                                        msg.name, 
-                                                                       10, 
+                                                                       _ROS_QOS, 
                                                                        callback_group=self.callback_groups[msg.name])
                 if msg.timer_period != 0:
-                    self.timers_dict[msg.name] = self.node.create_timer(msg.timer_period, 
-                                                                   partial(self.timer_callback, ros_msg=pub_msg, msg=msg, start_time=time.time()))
+                    self.timers_dict[msg.name] = self.node.create_timer(msg.timer_period, self.timer_callback(pub_msg, msg))
                                                                 #    callback_group=self.callback_groups[msg.name]))
             return True
         except Exception as e:
             self.publish_log(self.loggers[msg.ros_log.name], f"Failed to create publisher: {e}", log_level=LogLevel.ERROR)
             return False
         
-    def timer_callback(self, ros_msg: Any, msg: ROSMessage, start_time: float) -> None:
+    def timer_callback(self, ros_msg: Any, msg: ROSMessage):
         """
-        Timer callback function for ROS2 publishers.
+        Returns a timer callback function for ROS2 publishers, which publishes the already-converted
+        ROS2 message until the message's timer_duration has elapsed, and then cancels the timer.
+        The message gets serialized once up-front, and the publisher sends those bytes each tick.
         """
         assert(msg.node_type == NodeType.PUBLISHER)
-        elapsed_time = time.time() - start_time
-        if elapsed_time < msg.timer_duration:
-            print("do we get here")
-            self.publish_ros_message(ros_msg, msg)
-        # self.publish_log(self.loggers[msg.ros_log.name], f"Published message to topic: {msg.name}", log_level=LogLevel.INFO)
+        publisher = self.pubs[msg.name]
+        name = msg.name
+        serialized_msg = serialize_message(ros_msg)
+        end_time = time.monotonic() + msg.timer_duration
+        
+        def callback():
+            if time.monotonic() < end_time:
+                publisher.publish(serialized_msg)
+            elif self.timers_dict.get(name):
+                self.timers_dict[name].cancel()
+            
+        return callback
     
     def create_subscriber(self, msg: ROSMessage) -> bool:
         """
@@ -209,26 +259,69 @@ class ROS2Connector(Plugin, Node):
         try:
             self.subs[msg.name] = self.node.create_subscription(msg_class, 
                                                                     msg.name, 
-                                                                    partial(self.subscriber_callback, ros_msg=msg), 
-                                                                    10)
+                                                                    self.subscriber_callback(msg, msg_class), 
+                                                                    _ROS_QOS)
             return True
         except Exception as e:
             # self.publish_log(self.loggers[msg.ros_log.name], f"Failed to create subscriber: {e}", log_level=LogLevel.ERROR)
             return False
 
-    def subscriber_callback(self, msg, ros_msg: ROSMessage) -> None:
+    def subscriber_callback(self, msg: ROSMessage, msg_class):
         """
-        Callback function for ROS2 subscribers. Replace payload of original message with message
-        received by subscriber and JSON dump to output.
+        Returns a callback function for ROS2 subscribers. It replaces the payload of the original message with
+        the message received by the subscriber and outputs it as JSON.  The output prefix and message converter
+        get resolved here once, and captured by the callback instead of being bound with partial().
+        The callback only queues the received message, and process_outputs() converts and outputs it.
         """
-        # self.publish_log(self.loggers[ros_msg.ros_log.name], f"Received message from topic: {ros_msg.name}", log_level=LogLevel.INFO)
-        json_msg = self.ros_msg_to_json(msg)
-        # replace payload of original message with received message
-        ros_msg.msg = json_msg
-        # convert ROS2Message to JSON dict
-        out_msg = ros_msg.model_dump()
-        # put received message in output queue as JSON dict
-        self.output(out_msg, 0)
+        output_json = self.json_output(msg)
+        to_dict = _compile_to_dict(msg_class) or convert.message_to_ordereddict
+        output_queue = self.output_queue
+        output_event = self.output_event
+        
+        def callback(ros_msg):
+            # self.publish_log(self.loggers[msg.ros_log.name], f"Received message from topic: {msg.name}", log_level=LogLevel.INFO)
+            # put received message in output queue, with the functions for outputting it as JSON
+            output_queue.append((output_json, to_dict, ros_msg))
+            output_event.set()
+            
+        return callback
+
+    def process_outputs(self):
+        """
+        Runs in the output thread, converting the messages received by the subscribers to JSON and outputting them.
+        """
+        while not self.stop_flag:
+            self.output_event.wait(timeout=0.25)
+            self.output_event.clear()
+            
+            while self.output_queue:
+                output_json, to_dict, ros_msg = self.output_queue.popleft()
+                
+                try:
+                    output_json(to_dict(ros_msg))
+                except Exception as error:
+                    logging.error(f"ROS2Connector | failed to output received message\n\n{traceback.format_exc()}")
+
+    def json_output(self, msg: ROSMessage):
+        """
+        Returns a function that outputs the original message as JSON with its payload replaced.  The other fields
+        get encoded once, and each payload gets encoded after them into the same reused buffer (each of these
+        functions only gets called from one thread, either the executor's or the output thread).
+        """
+        fields = msgspec.to_builtins(msg)
+        del fields['msg']
+        
+        buffer = bytearray(_JSON_ENCODER.encode(fields)[:-1] + b',"msg":')
+        offset = len(buffer)
+        encode_into = _JSON_ENCODER.encode_into
+        output = self.output
+        
+        def output_json(payload):
+            encode_into(payload, buffer, offset)
+            buffer.extend(b'}')
+            output(buffer.decode(), 0)
+            
+        return output_json
 
     def create_service_client(self, msg: ROSMessage) -> bool:
         """
@@ -237,10 +330,8 @@ class ROS2Connector(Plugin, Node):
         assert(msg.node_type == NodeType.SERVICE_CLIENT)
         self.create_logger(msg)
         self.callback_groups[msg.name] = MutuallyExclusiveCallbackGroup()
-        _, msg_class = self.get_ros_message_type(msg)
+        _, msg_class, _ = self.get_ros_message_type(msg)
         self.service_clients[msg.name] = self.node.create_client(msg_class, msg.name)
-        while not self.service_clients[msg.name].wait_for_service(timeout_sec=1.0):
-            self.publish_log(self.loggers[msg.ros_log.name], f"service {msg.name} not available, waiting again...", log_level=LogLevel.INFO)
         return True
 
     def create_action_client(self, msg: ROSMessage) -> bool:
@@ -250,12 +341,51 @@ class ROS2Connector(Plugin, Node):
         assert(msg.node_type == NodeType.ACTION_CLIENT)
         self.create_logger(msg)
         self.callback_groups[msg.name] = MutuallyExclusiveCallbackGroup()
-        _, msg_class = self.get_ros_message_type(msg)
+        _, msg_class, _ = self.get_ros_message_type(msg)
         self.action_clients[msg.name] = ActionClient(self.node, msg_class, msg.name)
-        while not self.action_clients[msg.name].wait_for_server(timeout_sec=1.0):
-            self.publish_log(self.loggers[msg.ros_log.name], f"action server {msg.name} not available, waiting again...", log_level=LogLevel.INFO)
         return True
 
+    def send_when_ready(self, msg: ROSMessage, is_ready, send) -> None:
+        """
+        Call send() once is_ready() returns true for the message's service or action server.  Until then, the
+        requests get queued and the server gets checked from a timer each second, instead of blocking the executor.
+        """
+        name = msg.name
+        pending = self.pending_requests.get(name)
+        
+        if pending is not None:
+            pending.append(send)
+            return
+            
+        if is_ready():
+            send()
+            return
+            
+        logger = (self.loggers.get(msg.ros_log.name) if msg.ros_log else None) or self.node.get_logger()
+        logger.info(f"server {name} not available, waiting for it...")
+        
+        def check_server():
+            if not is_ready():
+                logger.info(f"server {name} not available, waiting again...", throttle_duration_sec=10.0)
+                return
+                
+            for send_request in self.stop_waiting_for_server(name):
+                send_request()
+                
+        self.pending_requests[name] = [send]
+        self.server_timers[name] = self.node.create_timer(1.0, check_server)
+        
+    def stop_waiting_for_server(self, name: str) -> list:
+        """
+        Destroy the timer waiting on the server, and return the requests that were waiting on it.
+        """
+        timer = self.server_timers.pop(name, None)
+        
+        if timer:
+            self.node.destroy_timer(timer)
+            
+        return self.pending_requests.pop(name, [])
+
     def create_logger(self, msg: ROSMessage):
         """
         Create a ROS2 logger.
@@ -270,6 +400,8 @@ class ROS2Connector(Plugin, Node):
             ros_logger.set_level(log_level)
             ros_logger.log(log_level, msg.ros_log.msg)
             self.loggers[msg.ros_log.name] = ros_logger
+            self.info_enabled[msg.ros_log.name] = ros_logger.is_enabled_for(rclpy.logging.LoggingSeverity.INFO)
+            self.get_log_functions(ros_logger)
         except Exception as e:
             self.node.get_logger().error(f"Failed to create logger: {e}")
             return False
@@ -280,36 +412,38 @@ class ROS2Connector(Plugin, Node):
         Publish a ROS2 log message.
         """
         try:
-            match log_level:
-                case LogLevel.DEBUG:
-                    logger.debug(msg)
-                case LogLevel.INFO:
-                    logger.info(msg)
-                case LogLevel.WARN:
-                    logger.warn(msg)
-                case LogLevel.ERROR:
-                    logger.error(msg)
-                case LogLevel.FATAL:
-                    logger.fatal(msg)
-                case _:
-                    logger.info(msg)
+            log_functions = self.log_functions.get(logger) or self.get_log_functions(logger)
+            log_functions.get(log_level, logger.info)(msg)
         except Exception as e:
             print(f"Failed to publish log message: {e}")
             self.node.get_logger().error(f"Failed to publish log message: {e}")
             return False
         return True
 
+    def get_log_functions(self, logger: RcutilsLogger) -> dict:
+        """
+        Look up the logging methods of the logger for each LogLevel once, so publish_log() can dispatch with a dict lookup.
+        """
+        self.log_functions[logger] = {
+            LogLevel.DEBUG: logger.debug,
+            LogLevel.INFO: logger.info,
+            LogLevel.WARN: logger.warn,
+            LogLevel.ERROR: logger.error,
+            LogLevel.FATAL: logger.fatal,
+        }
+        return self.log_functions[logger]
+        
     def publish_ros_message(self, ros_msg: Any, msg: ROSMessage) -> bool:
         """
-        Publish a ROS2 message to a topic.
+        Publish a ROS2 message to a topic.  The INFO log is only formatted if it's enabled, and is throttled
+        to once per second because this can get called at high rates.
         """
         assert(msg.node_type == NodeType.PUBLISHER)
-        # _, msg_class = self.get_ros_message_type(msg)
-        # ros_msg = self.json_to_ros_msg(msg, msg_class)
         try:
             publisher = self.pubs.get(msg.name)
             publisher.publish(ros_msg)
-            # self.publish_log(self.loggers[msg.ros_log.name], f"Published message to topic: {msg.name}", log_level=LogLevel.INFO)
+            if msg.ros_log and self.info_enabled.get(msg.ros_log.name):
+                self.loggers[msg.ros_log.name].info(f"Published message to topic: {msg.name}", throttle_duration_sec=1.0)
             return True
         except Exception as e:
             # self.publish_log(self.loggers[msg.ros_log.name], f"Failed to publish message: {e}", log_level=LogLevel.ERROR)
@@ -317,53 +451,58 @@ class ROS2Connector(Plugin, Node):
         
     def send_service_request_async(self, msg: ROSMessage) -> bool:
         """
-        Send a service request to a ROS2 service client, await response, and output response.
+        Send a service request to a ROS2 service client without blocking.  The response gets
+        output from service_response_callback() when the executor completes the request.
         """
         assert(msg.node_type == NodeType.SERVICE_CLIENT)
-        _, msg_class = self.get_ros_message_type(msg)
+        _, msg_class, _ = self.get_ros_message_type(msg)
         try:
             request_msg = self.json_to_ros_msg(msg, msg_class.Request)
             future = self.service_clients[msg.name].call_async(request_msg)
-            result_msg = future.result()
-            self.publish_log(self.loggers[msg.ros_log.name], f"Received response from service: {msg.name}", log_level=LogLevel.INFO)
-            result_json = self.ros_msg_to_json(result_msg)
-            # replace payload of original message with received message
-            msg.msg = result_json
-            # convert ROS2Message to JSON dict
-            out_msg = msg.model_dump()
-            # put received message in output queue as JSON dict
-            self.output(out_msg, 0)
+            future.add_done_callback(partial(self.service_response_callback, msg=msg))
             return True
         except Exception as e:
             self.publish_log(self.loggers[msg.ros_log.name], f"Failed to send service request: {e}", log_level=LogLevel.ERROR)
+            return False
+
+    def service_response_callback(self, future, msg: ROSMessage) -> None:
+        """
+        Callback function for ROS2 service responses. Replace payload of original message with the response and output it.
+        """
+        try:
+            result_msg = future.result()
+        except Exception as e:
+            self.publish_log(self.loggers[msg.ros_log.name], f"Service request failed: {msg.name} ({e})", log_level=LogLevel.ERROR)
+            return
+            
+        self.publish_log(self.loggers[msg.ros_log.name], f"Received response from service: {msg.name}", log_level=LogLevel.INFO)
+        result_json = self.ros_msg_to_json(result_msg)
+        # put received message in output queue as JSON, with the other fields from the original message
+        self.json_output(msg)(result_json)
 
     def send_action_goal(self, msg: ROSMessage) -> bool:
         assert(msg.node_type == NodeType.ACTION_CLIENT)
         action_client = self.action_clients[msg.name]
-        _, msg_class = self.get_ros_message_type(msg)
+        _, msg_class, _ = self.get_ros_message_type(msg)
+        output_json = self.json_output(msg)
         
         def goal_response_callback(future):
             goal_handle = future.result()
             if not goal_handle.accepted:
                 self.publish_log(self.loggers[msg.ros_log.name], f"Goal rejected by action server: {msg.name}", log_level=LogLevel.ERROR)
                 return
+            self.goal_handles[msg.name] = goal_handle
             self.publish_log(self.loggers[msg.ros_log.name], f"Goal accepted by action server: {msg.name}", log_level=LogLevel.INFO)
             _get_result_future = goal_handle.get_result_async()
             _get_result_future.add_done_callback(get_result_callback)
 
         def feedback_callback(feedback):
             feedback = feedback.feedback.sequence
-            self.publish_log(self.loggers[msg.ros_log.name], 
-                             'Received feedback: {0}'.format(feedback), 
-                             log_level=LogLevel.INFO)
+            if self.info_enabled.get(msg.ros_log.name):
+                self.loggers[msg.ros_log.name].info(f"Received feedback: {feedback}", throttle_duration_sec=1.0)
             feedback_json = self.ros_msg_to_json(feedback)
-            # replace payload in copy of original message with received message (will need original message again for result callback)
-            ros_msg = msg
-            ros_msg.msg = feedback_json
-            # convert ROS2Message to JSON dict
-            out_msg = ros_msg.model_dump()
-            # put received message in output queue as JSON dict
-            self.output(out_msg, 0)
+            # put received message in output queue as JSON (the original message is left unchanged for the result callback)
+            output_json(feedback_json)
 
         def get_result_callback(future):
             result = future.result().result
@@ -371,19 +510,13 @@ class ROS2Connector(Plugin, Node):
             if status == GoalStatus.STATUS_SUCCEEDED:
                 self.publish_log(self.loggers[msg.ros_log.name], f"Goal succeeded! Result: {result.sequence}", log_level=LogLevel.INFO)
                 result_json = self.ros_msg_to_json(result.sequence)
-                # replace payload in copy of original message with received message
-                ros_msg = msg
-                ros_msg.msg = result_json
-                # convert ROS2Message to JSON dict
-                out_msg = ros_msg.model_dump()
-                # put received message in output queue as JSON dict
-                self.output(out_msg, 0)
+                # put received message in output queue as JSON
+                output_json(result_json)
             else:
                 self.publish_log(self.loggers[msg.ros_log.name], f"Goal failed with status: {status}", log_level=LogLevel.ERROR)
 
         def send_goal():
             self.publish_log(self.loggers[msg.ros_log.name], f"Sending goal request to action server: {msg.name}", log_level=LogLevel.INFO)
-            action_client.wait_for_server()
             goal_msg_json = msg.msg
             goal_msg = self.json_to_ros_msg(goal_msg_json, msg_class.Goal)
             self.publish_log(self.loggers[msg.ros_log.name], f"Sending goal request...", log_level=LogLevel.INFO)
@@ -392,112 +525,147 @@ class ROS2Connector(Plugin, Node):
                                                               feedback_callback=feedback_callback)
             _send_goal_future.add_done_callback(goal_response_callback)
             
-        # This will return a goal handle that can be used to cancel the goal
+        # The goal handle that can be used to cancel the goal gets saved once the server accepts it
         try:
-            action_goal_handle = send_goal()
+            send_goal()
         except Exception as e:
             self.publish_log(self.loggers[msg.ros_log.name], f"Failed to send action goal: {e}", log_level=LogLevel.ERROR)
-            return
-        return action_goal_handle
+            return False
+        return True
 
     def process(self, input: dict, **kwargs): 
         """
         Create a ROS2 publisher, subscriber, service client, or action client.
         Publish messages to topics, subscribe to topics, send service requests, and send action goals.
+        The entities for the message's name and its 'destroy'/'cancel' commands get resolved once up-front.
         """
-        json_msg = input
-        msg = self.get_ros_msg_from_json(json_msg)
+        msg = self.get_ros_msg_from_json(input)
+        
+        if not msg:
+            return
+            
         msg_type, msg_class, node_type = self.get_ros_message_type(msg)
-        # Convert JSON message payload to ROS2 message for any publishing
-        ros_msg = self.json_to_ros_msg(msg, msg_class)
+        
+        name = msg.name
+        command = msg.msg.lower() if isinstance(msg.msg, str) else None
+        is_destroy = (command == 'destroy')
+        is_cancel = (command == 'cancel')
+        log_name = msg.ros_log.name if msg.ros_log else None
 
         match node_type:
 
             case NodeType.PUBLISHER:
-                # Don't bother creating a publisher if it's already been created and don't create a new one for a 'destroy' message
-                if not self.pubs.get(msg.name) and (not isinstance(msg.msg, str) or msg.msg.lower() != 'destroy'):
-                    self.create_publisher(msg, msg_class)
-                    if msg.timer_period == 0:
-                        self.publish_ros_message(msg)
-                        # self.publish_log(self.loggers[msg.ros_log.name], f"Published message to topic: {msg.name}", log_level=LogLevel.INFO)
-                elif self.pubs.get(msg.name) and (not isinstance(msg.msg, str) or msg.msg.lower() == 'destroy'):
+                pub = self.pubs.get(name)
+                
+                # Stop the existing publisher's timer when it gets destroyed or gets a new message
+                if pub and (is_destroy or command is None):
+                    timer = self.timers_dict.pop(name, None)
+                    if timer:
+                        timer.destroy()
+                    
+                if is_destroy:
+                    if pub:
+                        pub.destroy()
+                        del self.pubs[name]
+                        self.callback_groups.pop(name, None)
+                        self.destroy_log(log_name, f"Publisher destroyed: {name}")
+                elif command is None:
+                    # Convert JSON message payload to ROS2 message for publishing
+                    ros_msg = self.json_to_ros_msg(msg, msg_class)
+                    
+                    if not pub:
+                        self.create_publisher(msg, msg_class, ros_msg)
+                    elif msg.timer_period != 0:
+                        self.timers_dict[name] = self.node.create_timer(msg.timer_period, self.timer_callback(ros_msg, msg))
+                        
                     if msg.timer_period == 0:
-                        if self.timers_dict.get(msg.name):
-                            self.timers_dict[msg.name].destroy()
-                            del self.timers_dict[msg.name]
-                        self.publish_ros_message(msg)
-                        # self.publish_log(self.loggers[msg.ros_log.name], f"Published message to topic: {msg.name}", log_level=LogLevel.INFO)
-                    else:
-                        if self.timers_dict.get(msg.name):
-                            self.timers_dict[msg.name].destroy()
-                            del self.timers_dict[msg.name]
-                        self.timers_dict[msg.name] = self.node.create_timer(msg.timer_period, 
-                                                                       partial(self.timer_callback, ros_msg=ros_msg, 
-                                                                       msg=msg, start_time=time.time()))
-                elif not isinstance(msg.msg, str) or msg.msg.lower() == 'destroy':
-                    if self.timers_dict.get(msg.name):
-                        self.timers_dict[msg.name].destroy()
-                        del self.timers_dict[msg.name]
-                    self.pubs[msg.name].destroy()
-                    del self.pubs[msg.name]
-                    del self.callback_groups[msg.name]
-                    del self.loggers[msg.ros_log.name]
-                    self.publish_log(self.loggers[msg.ros_log.name], f"Publisher destroyed: {msg.name}", log_level=LogLevel.INFO)
+                        self.publish_ros_message(ros_msg, msg)
 
             case NodeType.SUBSCRIBER:
-                if not self.subs.get(msg.name):
+                sub = self.subs.get(name)
+                
+                if not sub and not is_destroy:
                     self.create_subscriber(msg)
-                if isinstance(msg.msg, str) and msg.msg.lower() == 'destroy':
-                    self.subs[msg.name].destroy()
-                    del self.subs[msg.name]
-                    del self.callback_groups[msg.name]
-                    del self.loggers[msg.ros_log.name]
-                    # self.publish_log(self.loggers[msg.ros_log.name], f"Subscriber destroyed: {msg.name}", log_level=LogLevel.INFO)
+                elif sub and is_destroy:
+                    sub.destroy()
+                    del self.subs[name]
+                    self.callback_groups.pop(name, None)
+                    self.destroy_log(log_name, f"Subscriber destroyed: {name}")
             
             case NodeType.SERVICE_CLIENT:
-                if not self.service_clients.get(msg.name):
-                    self.create_service_client(msg, msg_class)
-                    self.send_service_request_async(msg)
-                elif msg.msg.lower() == 'destroy':
-                    self.service_clients[msg.name].destroy()
-                    del self.service_clients[msg.name]
-                    del self.callback_groups[msg.name]
-                    del self.loggers[msg.ros_log.name]
-                    self.publish_log(self.loggers[msg.ros_log.name], f"Service client destroyed: {msg.name}", log_level=LogLevel.INFO)
+                service_client = self.service_clients.get(name)
+                
+                if command is None:
+                    if not service_client:
+                        self.create_service_client(msg)
+                        service_client = self.service_clients[name]
+                    self.send_when_ready(msg, service_client.service_is_ready, partial(self.send_service_request_async, msg))
+                elif service_client and is_destroy:
+                    self.stop_waiting_for_server(name)
+                    service_client.destroy()
+                    del self.service_clients[name]
+                    self.callback_groups.pop(name, None)
+                    self.destroy_log(log_name, f"Service client destroyed: {name}")
             
             case NodeType.ACTION_CLIENT:
-                # Don't bother creating an action client if it's already been created and don't create one if the message is 'cancel' or 'destroy'
-                if not self.action_clients.get(msg.name) and not msg.msg.lower() == 'cancel' and not msg.msg.lower() == 'destroy':
-                    self.create_action_client(msg, msg_class)
-                    self.goal_handles[msg.name] = self.send_action_goal(msg)
-                elif msg.msg.lower() == 'cancel':
-                    self.goal_handles[msg.name].cancel_goal()
-                    self.publish_log(self.loggers[msg.ros_log.name], f"Goal canceled for action server: {msg.name}", log_level=LogLevel.INFO)
-                elif msg.msg.lower() == 'destroy':
-                    self.action_clients[msg.name].destroy()
-                    del self.action_clients[msg.name]
-                    del self.callback_groups[msg.name]
-                    del self.loggers[msg.ros_log.name]
-                    del self.goal_handles[msg.name]
-                    self.publish_log(self.loggers[msg.ros_log.name], f"Action client destroyed: {msg.name}", log_level=LogLevel.INFO)
+                action_client = self.action_clients.get(name)
+                
+                # Send goals with the existing action client if it's already been created, and don't create one if the message is 'cancel' or 'destroy'
+                if command is None:
+                    if not action_client:
+                        self.create_action_client(msg)
+                        action_client = self.action_clients[name]
+                    self.send_when_ready(msg, action_client.server_is_ready, partial(self.send_action_goal, msg))
+                elif is_cancel:
+                    goal_handle = self.goal_handles.get(name)
+                    if goal_handle:
+                        goal_handle.cancel_goal_async()
+                        self.publish_log(self.loggers[log_name], f"Goal canceled for action server: {name}", log_level=LogLevel.INFO)
+                elif action_client and is_destroy:
+                    self.stop_waiting_for_server(name)
+                    action_client.destroy()
+                    del self.action_clients[name]
+                    self.callback_groups.pop(name, None)
+                    self.goal_handles.pop(name, None)
+                    self.destroy_log(log_name, f"Action client destroyed: {name}")
             
             case _:
                 self.node.get_logger().error(f"Invalid ROS2 node type: {msg.node_type}")
     
+    def destroy_log(self, log_name: str, msg: str):
+        """
+        Log that an entity was destroyed to its logger (if it has one), and then remove the logger.
+        """
+        logger = self.loggers.pop(log_name, None)
+        
+        if logger is None:
+            self.node.get_logger().info(msg)
+            return
+            
+        self.publish_log(logger, msg, log_level=LogLevel.INFO)
+        self.log_functions.pop(logger, None)
+        self.info_enabled.pop(log_name, None)
+        
+    def input(self, input=None, **kwargs):
+        """
+        Add data to the plugin's processing queue like :func:`Plugin.input()`, and wake up the executor
+        waiting in run() so that it gets processed right away.
+        """
+        Plugin.input(self, input, **kwargs)
+        self.input_guard.trigger()
+        
     # Override the Plugin.run method to spin the ROS2 node
     def run(self):
         """
-        Processes the queue forever and automatically run when created with ``threaded=True``
+        Processes the queue forever and automatically run when created with ``threaded=True``.
+        The ROS2 executor gets spun from this same thread, and waits until callbacks are ready or inputs
+        get queued (which trigger the input guard condition).  The executor keeps dispatching the callbacks
+        that were ready from its last wait before waiting again, so it isn't limited to one per pass.
         """
-        ### Spin the node############
-        # self.executor.spin(self.node)
-        self._executor_thread = threading.Thread(target=self.exec.spin)
-        self._executor_thread.start()
-        #############################
-
         while not self.stop_flag:
             try:
-                self.process_inputs(timeout=0.25)
+                self.exec.spin_once(timeout_sec=0.25)
+                self.process_inputs(timeout=0)
             except Exception as error:
                 logging.error(f"Exception occurred during processing of {self.name}\n\n{traceback.format_exc()}")
 
@@ -508,36 +676,151 @@ class ROS2Connector(Plugin, Node):
         """
         Stop a plugin thread's running, and unregister it from the global instances.
         """ 
+        # wait for the run() thread to stop spinning before shutting down the executor
+        self.stop()
+        self.input_guard.trigger()
+        
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+            
+        if threading.current_thread() is not self.output_thread:
+            self.output_thread.join()
+            
         ### Shut down and Destroy the node #####
         self.exec.shutdown()
-        self.node.destroy_node('ros2_connector')
+        self.node.destroy_node()
         rclpy.shutdown()
         ########################################
 
-        self.stop()
-                
-        try:
-            Plugin.Instances.remove(self)
-        except ValueError:
-            logging.warning(f"Plugin {getattr(self, 'name', '')} wasn't in global instances list when being deleted")
-        
-        plugin.destroy()
-        del plugin
+        Plugin.destroy(self)
 
     def json_to_ros_msg(self, msg, msg_class):
         """
-        Convert JSON message to ROS2 message.
+        Convert JSON message (or the payload dict) to ROS2 message.  Messages with only nested dicts of scalars
+        and numeric arrays (like Twist or LaserScan) get set with a generated function that assigns their fields
+        directly, and the others fall back to set_message_fields().
         """
         ros_msg = msg_class()
-        msg_dict = msg.msg
+        msg_dict = msg.msg if isinstance(msg, ROSMessage) else msg
+        field_paths = _field_paths(msg_dict)
+        field_setter = _compile_field_setter(msg_class, field_paths) if field_paths else None
+        
+        if field_setter is not None:
+            try:
+                field_setter(ros_msg, msg_dict)
+                return ros_msg
+            except (TypeError, ValueError, AssertionError):
+                ros_msg = msg_class()  # let set_message_fields() handle (or report) the values that didn't convert
+                
         set_message.set_message_fields(ros_msg, msg_dict)
         return ros_msg
 
     def ros_msg_to_json(self, ros_msg) -> dict:
         """
-        Convert ROS2 message to JSON message.
+        Convert ROS2 message to JSON message.  Messages with only primitive and nested message fields
+        get read with a generated function, and the others (like those with arrays) fall back to
+        message_to_ordereddict().
         """
+        to_dict = _compile_to_dict(type(ros_msg))
+        
+        if to_dict is not None:
+            return to_dict(ros_msg)
+            
         return convert.message_to_ordereddict(ros_msg)
 
     def state_dict(self, **kwargs):
         return {**super().state_dict(**kwargs)}
+
+
+_SCALAR_TYPES = (bool, int, float, str)
+
+def _field_paths(msg_dict: dict, prefix: tuple=()) -> tuple:
+    """
+    Returns a tuple with the key path to each scalar value or list in the nested dict,
+    or None if it contains other types that need set_message_fields().
+    """
+    paths = []
+    
+    for key, value in msg_dict.items():
+        if isinstance(value, dict):
+            sub_paths = _field_paths(value, prefix + (key,))
+            if sub_paths is None:
+                return None
+            paths.extend(sub_paths)
+        elif isinstance(value, (*_SCALAR_TYPES, list)):
+            paths.append(prefix + (key,))
+        else:
+            return None
+            
+    return tuple(paths)
+
+@functools.lru_cache(maxsize=256)
+def _compile_field_setter(msg_class, field_paths: tuple):
+    """
+    Generate a function that assigns the values at the key paths of a dict to those fields of a ROS2 message,
+    casting them to each field's type like set_message_fields() does.  These are cached by the message class
+    and the layout of the dict.  Returns None if any of the paths aren't scalar or numeric array fields of the message.
+    
+    Lists for numeric sequences (stored as array.array) and fixed-size arrays (stored as numpy) get converted
+    to those types in C, which the message setters then accept without checking each element in Python.
+    """
+    prototype = msg_class()
+    namespace = {}
+    lines = []
+    
+    for i, path in enumerate(field_paths):
+        field = prototype
+        
+        for key in path:
+            if not isinstance(key, str) or not key.isidentifier() or key not in field.get_fields_and_field_types():
+                return None
+            field = getattr(field, key)
+            
+        if isinstance(field, _SCALAR_TYPES):
+            namespace[f'_type{i}'] = type(field)
+        elif isinstance(field, array.array):
+            namespace[f'_type{i}'] = functools.partial(array.array, field.typecode)
+        elif isinstance(field, np.ndarray):
+            namespace[f'_type{i}'] = functools.partial(np.asarray, dtype=field.dtype)
+        else:
+            return None
+            
+        lines.append(f"    m.{'.'.join(path)} = _type{i}(d{''.join(f'[{key!r}]' for key in path)})")
+        
+    exec("def field_setter(m, d):\n" + "\n".join(lines), namespace)
+    return namespace['field_setter']
+
+_PRIMITIVE_FIELD = re.compile(r'boolean|byte|char|octet|float|double|u?int(8|16|32|64)|w?string(<=\d+)?')
+
+@functools.lru_cache(maxsize=256)
+def _compile_to_dict(msg_class):
+    """
+    Generate a function that reads the fields of a ROS2 message into a dict, recursing into nested messages,
+    instead of reflecting over them for every message.  These are cached by the message class.
+    Returns None if the message has array/sequence fields, which need message_to_ordereddict().
+    """
+    get_field_types = getattr(msg_class, 'get_fields_and_field_types', None)
+    
+    if get_field_types is None:
+        return None
+        
+    prototype = msg_class()
+    namespace = {}
+    items = []
+    
+    for i, (name, field_type) in enumerate(get_field_types().items()):
+        if not name.isidentifier() or keyword.iskeyword(name):
+            return None
+        if _PRIMITIVE_FIELD.fullmatch(field_type):
+            items.append(f"{name!r}: m.{name}")
+        elif '/' in field_type and '<' not in field_type and '[' not in field_type:
+            nested_to_dict = _compile_to_dict(type(getattr(prototype, name)))
+            if nested_to_dict is None:
+                return None
+            namespace[f'_to_dict{i}'] = nested_to_dict
+            items.append(f"{name!r}: _to_dict{i}(m.{name})")
+        else:
+            return None
+            
+    exec("def to_dict(m):\n    return {" + ", ".join(items) + "}", namespace)
+    return namespace['to_dict']
@@ -13,8 +13,13 @@ from packaging.version import Version
 
 from huggingface_hub import snapshot_download, hf_hub_download, login
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    
 
-__all__ = ['download_model', 'default_model_api', 'rename_weights', 'ONNXRuntimeModel']
+__all__ = ['download_model', 'default_model_api', 'rename_weights', 'load_json', 'save_json', 'ONNXRuntimeModel']
 
 
 def download_model(model, type='model', cache_dir='$TRANSFORMERS_CACHE', use_safetensors=False, **kwargs):
@@ -87,6 +92,31 @@ def default_model_api(model_path, quant_path=None):
         return 'mlc' #'hf'
         
 
+def load_json(path):
+    """
+    Parse a JSON file (like a model's config.json) with orjson if it's installed, otherwise with the json module.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+        
+    if orjson is not None:
+        return orjson.loads(data)
+    else:
+        return json.loads(data)
+        
+        
+def save_json(path, obj, indent=2):
+    """
+    Write the object to a JSON file with orjson if it's installed (which only supports ``indent=2``), otherwise with the json module.
+    """
+    if orjson is not None and indent in (2, None):
+        with open(path, 'wb') as file:
+            file.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None))
+    else:
+        with open(path, 'w') as file:
+            json.dump(obj, file, indent=indent)
+            
+            
 def rename_weights(model_path: str, save_path: str=None, key: callable=None):
     """
     Apply a renaming function ``key`` to the layer names in the model's weight files.
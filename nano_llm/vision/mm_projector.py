@@ -29,6 +29,10 @@ class MMProjector():
                          (e.g. liuhaotian/llava-v1.5-13b)
                          
           dtype (dtype) -- use either torch.float32 or torch.float16 weights
+          
+          quantization (str) -- 'int8_wo' or 'fp8_wo' for weight-only quantization with torchao
+          
+          use_tensorrt (bool) -- build TensorRT engines for the projector with torch_tensorrt
         """
         from nano_llm import NanoLLM
         
@@ -41,7 +45,7 @@ class MMProjector():
         else:
             raise ValueError(f"model should either be a string containing the path or name of the HuggingFace model, or a NanoLLM model instance")
             
-    def __init__(self, model_path, config=None, input_dim=None, output_dim=None, dtype=torch.float16):
+    def __init__(self, model_path, config=None, input_dim=None, output_dim=None, dtype=torch.float16, quantization=None, use_tensorrt=False):
         """
         Create the mm_projector network and load its weights
         """
@@ -58,6 +62,8 @@ class MMProjector():
 
         self.model_path = model_path
         self.dtype = dtype
+        self.use_tensorrt = use_tensorrt and not quantization
+        self.trt_models = {}  # TensorRT engines for each input shape
         self.type = self.config.get('mm_projector_type', 'linear')
         
         if any(['openvla' in arch.lower() for arch in config.get('architectures', [])]):
@@ -130,13 +136,81 @@ class MMProjector():
         
         self.model.load_state_dict(weights)
         self.model.to(dtype=self.dtype, device='cuda:0').eval()
+        
+        if quantization:
+            self.quantize(quantization)
 
-    def __call__(self, *args, **kwargs):
+    def quantize(self, method='int8_wo'):
+        """
+        Apply weight-only quantization to the linear layers with torchao, either 'int8_wo' (per-channel INT8)
+        or 'fp8_wo' (FP8, which needs compute capability 8.9 or newer and otherwise falls back to INT8).
+        The activations stay in fp16, and no calibration is needed.  At batch size 1 the projector is
+        bound by loading its weights, so halving their size speeds it up.
+        """
+        from torchao.quantization import quantize_
+        
+        if any(param.dtype not in (torch.float16, torch.bfloat16, torch.float32) for param in self.model.parameters()):
+            logging.warning(f"mm_projector weights are already low-precision, skipping quantization to {method}")
+            return
+            
+        if method == 'fp8_wo' and torch.cuda.get_device_capability() < (8,9):
+            logging.warning("mm_projector FP8 quantization needs compute capability 8.9 or newer, using 'int8_wo' instead")
+            method = 'int8_wo'
+            
+        if method == 'int8_wo':
+            from torchao.quantization import Int8WeightOnlyConfig
+            config = Int8WeightOnlyConfig()
+        elif method == 'fp8_wo':
+            from torchao.quantization import Float8WeightOnlyConfig
+            config = Float8WeightOnlyConfig()
+        else:
+            raise ValueError(f"mm_projector quantization should be 'int8_wo' or 'fp8_wo' (was '{method}')")
+            
+        quantize_(self.model, config)
+        logging.info(f"mm_projector quantized with {method}")
+        
+    def __call__(self, x):
         """
         Forward-pass call to the model
         """
+        model = self.model
+        
+        if self.use_tensorrt:
+            trt_model = self.trt_models.get(tuple(x.shape))
+            
+            if trt_model is None:
+                trt_model = self.build_tensorrt(x.shape, x.device)
+                
+            if trt_model:
+                model = trt_model
+                
         with torch.inference_mode():
-            return self.model(*args, **kwargs)
+            return model(x)
+            
+    def build_tensorrt(self, shape, device='cuda:0'):
+        """
+        Build a TensorRT engine of the projector for inputs with this shape, and cache it.
+        If torch_tensorrt isn't installed or the build fails, the projector keeps running in PyTorch.
+        """
+        shape = tuple(shape)
+        
+        try:
+            import torch_tensorrt
+            
+            with torch.inference_mode(False):
+                trt_model = torch_tensorrt.compile(
+                    self.model, ir='dynamo',
+                    inputs=[torch.zeros(shape, dtype=self.dtype, device=device)],
+                    enabled_precisions={self.dtype},
+                )
+                
+            logging.info(f"mm_projector built TensorRT engine for input shape {shape}")
+        except Exception as error:
+            logging.warning(f"mm_projector failed to build TensorRT engine for input shape {shape}, using PyTorch  ({error})")
+            trt_model = False
+            
+        self.trt_models[shape] = trt_model
+        return trt_model
             
     @staticmethod
     def load_torch(filename):